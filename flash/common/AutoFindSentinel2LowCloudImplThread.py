@@ -2,6 +2,7 @@
 # @Author : ZXQ
 # @Time : 2025/9/13 12:18
 import threading
+from typing import List
 
 import ee
 from PySide6.QtCore import QThread, Signal, QObject, Slot
@@ -12,20 +13,69 @@ from flash.model.ConditionBuilder import ConditionBuilder
 from flash.model.DataPathConfig import DataPathConfig
 from flash.model.DataSourceConfigure import DataSourceConfigure
 from flash.model.Sentinel2DataSourceConfigure import Sentinel2DataSourceConfigure
-from flash.model.Sentinel2Image import parse_any
+from flash.model.SceneTable import SceneTable
+from flash.model.Sentinel2Image import parse_any, deduplicate_sentinel2_images, Sentinel2Image, \
+    METADATA_COLUMNS, METADATA_FETCH_COLUMNS
 from flash.model.ThreadOperateStatus import ThreadOperateStatus
 from flash.model.VectorFile import VectorFile
 from flash.service.AutoFindSentinel2LowCloudDownLoadImageImpl import AutoFindSentinel2LowCloudDownLoadImageImpl
+from flash.service.SqliteSceneCatalogServiceImpl import SqliteSceneCatalogServiceImpl, date_to_millis
+from flash.util.GEEScriptFunUtil import fetch_collection_columns
+from flash.util.vector_util import prepare_roi
+
+
+STAGE_QUERY = 'query'
+STAGE_PARSE = 'parse'
+STAGE_SEARCH = 'search'
+STAGE_LIST = [STAGE_QUERY, STAGE_PARSE, STAGE_SEARCH]
+STAGE_TEXT = {STAGE_QUERY: '查询影像元数据', STAGE_PARSE: '解析与去重', STAGE_SEARCH: '搜索镶嵌组合'}
 
 
 class AutoFindSentinel2LowCloudImplThread(QThread):
     emit_thumbnail_url = Signal(list)
     emit_progress = Signal(dict)
+    ## 阶段进度：{'stage', 'text', 'index', 'total', 'status'}，status 为 started / finished / cancelled / failed
+    emit_stage = Signal(dict)
+
     def __init__(self, sentinel2_data_source_configure: Sentinel2DataSourceConfigure, thread_operate_status: ThreadOperateStatus):
+        """构造函数在界面线程中执行，只保存参数；查询、解析、搜索都在 run() 中分阶段执行"""
         super().__init__()
         self.sentinel2_data_source_configure = sentinel2_data_source_configure
         self.thread_operate_status = thread_operate_status
-        roi = geemap.shp_to_ee(sentinel2_data_source_configure.roi.file_path)
+        self.auto_find_sentinel2_low_cloud_impl = None
+        self.dropped_duplicate_count = 0
+
+    @staticmethod
+    def query_sentinel2_images(sentinel2_data_source_configure: Sentinel2DataSourceConfigure) -> List[Sentinel2Image]:
+        """
+        查询影像元数据：启用本地目录时增量刷新后在本地查询；
+        否则直接查询 GEE，columns 模式只取用到的属性列，full 模式整体 getInfo。
+        本地目录和 columns 模式返回列式表的行视图（SceneRow），不保留波段信息
+        """
+        collection_id = sentinel2_data_source_configure.s2_sr_harmonized
+        roi_file = sentinel2_data_source_configure.roi
+        fetch_mode = sentinel2_data_source_configure.metadata_fetch_mode
+        page_size = sentinel2_data_source_configure.metadata_page_size
+        data_path_config = sentinel2_data_source_configure.data_path_config
+        if sentinel2_data_source_configure.use_scene_catalog and data_path_config.base_path:
+            start_millis = date_to_millis(sentinel2_data_source_configure.start_date)
+            end_millis = date_to_millis(sentinel2_data_source_configure.end_date)
+            catalog = SqliteSceneCatalogServiceImpl(data_path_config.catalog_path, fetch_mode, page_size)
+            written = catalog.sync(collection_id, roi_file, start_millis, end_millis)
+            print(f"本地影像目录增量刷新：写入 {written} 景")
+            builder = (
+                ConditionBuilder()
+                .add("system:time_start", "gte", start_millis)
+                .add("system:time_start", "lt", end_millis)
+            )
+            ## 未设置云量阈值时不加云量条件（cloud < NULL 在 SQL 中不匹配任何行）
+            if sentinel2_data_source_configure.cloud_coverage is not None:
+                builder.add('CLOUDY_PIXEL_PERCENTAGE', 'lt', sentinel2_data_source_configure.cloud_coverage)
+            builder.and_()
+            features = catalog.query(collection_id, roi_file, builder)['features']
+            return SceneTable.from_features(features, roi_file).rows()
+
+        roi = prepare_roi(roi_file).ee_geometry
         # 构造条件：年份 = 2020 且 NDVI > 2000
         builder = (
             ConditionBuilder()
@@ -39,20 +89,17 @@ class AutoFindSentinel2LowCloudImplThread(QThread):
         )
 
         filter_condition = builder.build()
-        collection = ee.ImageCollection(sentinel2_data_source_configure.s2_sr_harmonized).filter(filter_condition)
+        collection = ee.ImageCollection(collection_id).filter(filter_condition)
         filtered = collection.filter(filter_condition)
-        info = filtered.getInfo()
-        sentinel2_image = parse_any(info, sentinel2_data_source_configure.roi)
-        self.auto_find_sentinel2_low_cloud_impl = AutoFindSentinel2LowCloudDownLoadImageImpl(
-            sentinel2_image=sentinel2_image,
-            sentinel2_data_source_configure=self.sentinel2_data_source_configure)
-
-        self.set_thread_operate_status(self.thread_operate_status)
-        self.auto_find_sentinel2_low_cloud_impl.emit_thumbnail_url.connect(self.call_back)
-        self.auto_find_sentinel2_low_cloud_impl.emit_progress.connect(self.call_back_progress_max_value)
+        if fetch_mode == METADATA_FETCH_COLUMNS:
+            columns = fetch_collection_columns(filtered, METADATA_COLUMNS, page_size)
+            return SceneTable.from_columns(columns, roi_file).rows()
+        return parse_any(filtered.getInfo(), roi_file)
 
     def set_thread_operate_status(self, thread_operate_status: ThreadOperateStatus):
-        self.auto_find_sentinel2_low_cloud_impl.receive_thead_operate_status.emit(thread_operate_status)
+        self.thread_operate_status = thread_operate_status
+        if self.auto_find_sentinel2_low_cloud_impl is not None:
+            self.auto_find_sentinel2_low_cloud_impl.receive_thead_operate_status.emit(thread_operate_status)
 
     @Slot(list)
     def call_back(self, result):
@@ -65,7 +112,51 @@ class AutoFindSentinel2LowCloudImplThread(QThread):
 
     def run(self):
         print("run 线程：", QThread.currentThread(), threading.get_ident())
-        # if self.auto_find_sentinel2_low_cloud_impl.thread_operate_status.is_paused:
-        #     self.set_thread_operate_status(self.thread_operate_status)
-        # else:
-        self.auto_find_sentinel2_low_cloud_impl.find()
+        configure = self.sentinel2_data_source_configure
+        stage = STAGE_QUERY
+        try:
+            ## 1. 查询影像元数据（阻塞的 getInfo / 本地目录）
+            if not self._begin_stage(stage):
+                return
+            sentinel2_image = self.query_sentinel2_images(configure)
+            self._emit_stage(stage, 'finished')
+
+            ## 2. 解析与去重：去掉重复产品，避免组合数和缩略图下载成倍增加
+            stage = STAGE_PARSE
+            if not self._begin_stage(stage):
+                return
+            sentinel2_image, self.dropped_duplicate_count = deduplicate_sentinel2_images(
+                sentinel2_image, configure.dedup_policy)
+            print(f"重复产品去重：共 {len(sentinel2_image) + self.dropped_duplicate_count} 景，"
+                  f"去掉 {self.dropped_duplicate_count} 景，保留 {len(sentinel2_image)} 景")
+            self._emit_stage(stage, 'finished')
+
+            ## 3. 搜索镶嵌组合，阶段内的暂停 / 停止由 find() 循环处理
+            stage = STAGE_SEARCH
+            if not self._begin_stage(stage):
+                return
+            self.auto_find_sentinel2_low_cloud_impl = AutoFindSentinel2LowCloudDownLoadImageImpl(
+                sentinel2_image=sentinel2_image,
+                sentinel2_data_source_configure=configure)
+            self.auto_find_sentinel2_low_cloud_impl.emit_thumbnail_url.connect(self.call_back)
+            self.auto_find_sentinel2_low_cloud_impl.emit_progress.connect(self.call_back_progress_max_value)
+            self.set_thread_operate_status(self.thread_operate_status)
+            self.auto_find_sentinel2_low_cloud_impl.find()
+            self._emit_stage(stage, 'cancelled' if self.thread_operate_status.is_stopped else 'finished')
+        except Exception as e:
+            print(f"{STAGE_TEXT[stage]}失败: {e}")
+            self._emit_stage(stage, 'failed')
+
+    def _begin_stage(self, stage) -> bool:
+        """阶段开始前的检查点：暂停时等待，已停止时返回 False"""
+        while self.thread_operate_status.is_paused:
+            self.msleep(500)
+        if self.thread_operate_status.is_stopped or self.isInterruptionRequested():
+            self._emit_stage(stage, 'cancelled')
+            return False
+        self._emit_stage(stage, 'started')
+        return True
+
+    def _emit_stage(self, stage, status):
+        self.emit_stage.emit({'stage': stage, 'text': STAGE_TEXT[stage], 'index': STAGE_LIST.index(stage) + 1,
+                              'total': len(STAGE_LIST), 'status': status})
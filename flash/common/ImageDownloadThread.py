@@ -7,6 +7,7 @@ import ee
 import geemap
 
 from flash.util.S2_Util import generate_md5_filename
+from flash.util.vector_util import prepare_roi
 
 
 class ImageDownloadThread(QThread):
@@ -81,13 +82,13 @@ class ImageDownloadThread(QThread):
 
         self.progress_updated.emit("合并图片集合...")
 
-        # 获取网格数据
-        grids = self.data_source_configure.roi.gdf
-        grids = geemap.gdf_to_ee(grids)
+        # 获取网格数据：裁剪用合并简化后的 ROI，分瓦片下载按原始要素（每个网格单元一个瓦片）
+        prepared_roi = prepare_roi(self.data_source_configure.roi)
+        grids = prepared_roi.ee_grid_features
 
         # 合并图片并进行处理
         self.progress_updated.emit("创建镶嵌图像...")
-        image = ee.ImageCollection(images).mosaic().select('B.*').clip(grids).divide(10000)
+        image = ee.ImageCollection(images).mosaic().select('B.*').clip(prepared_roi.ee_geometry).divide(10000)
 
         if self._is_cancelled:
             return
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/18 15:20
+import dataclasses
+from typing import Sequence
+
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+
+DAY_MILLIS = 24 * 3600 * 1000
+
+
+@dataclasses.dataclass
+class CombinationCost:
+    """
+    镶嵌组合代价：云量 + 景数 + 时间跨度，越小越好。
+
+    云量和景数对每景影像可分离（item_cost），时间跨度只能对整个组合计算（penalty），
+    且恒为非负，供最优优先枚举使用。
+    """
+    cloud_weight: float = 1.0
+    tile_count_weight: float = 5.0
+    date_spread_weight: float = 0.5  # 每天
+
+    def item_cost(self, item: Sentinel2TileItem) -> float:
+        cloud = item.sentinel2Image.CLOUDY_PIXEL_PERCENTAGE
+        cloud = 100.0 if cloud is None else float(cloud)
+        return self.cloud_weight * cloud + self.tile_count_weight
+
+    def penalty(self, items: Sequence[Sentinel2TileItem]) -> float:
+        times = [item.sentinel2Image.system_time_start for item in items
+                 if item.sentinel2Image.system_time_start is not None]
+        if len(times) < 2:
+            return 0.0
+        return self.date_spread_weight * (max(times) - min(times)) / DAY_MILLIS
+
+    def cost(self, items: Sequence[Sentinel2TileItem]) -> float:
+        return sum(self.item_cost(item) for item in items) + self.penalty(items)
@@ -6,6 +6,14 @@ import ee
 
 import ee
 
+# 本地目录（SQLite）中有独立列的字段，其余字段从属性 JSON 中取
+SQL_COLUMNS = {
+    "MGRS_TILE": "mgrs_tile",
+    "system:time_start": "time_start",
+    "CLOUDY_PIXEL_PERCENTAGE": "cloud",
+}
+SQL_OPS = {"eq": "=", "lt": "<", "gt": ">", "lte": "<=", "gte": ">=", "neq": "!="}
+
 
 class Condition:
     def __init__(self, field, op, value):
@@ -40,3 +48,21 @@ class Condition:
             # bounds 操作符不需要 field 参数
             return ops[self.op](self.value)
         return ops[self.op](self.field, self.value)
+
+    def to_sql(self):
+        """
+        转为本地目录查询的 SQL 片段 (where, params)。
+
+        目录按 ROI 建立，bounds 条件恒为真，返回 None；值必须是本地值，不能是 ee 对象。
+        """
+        if self.op == "bounds":
+            return None
+        if isinstance(self.value, ee.ComputedObject):
+            raise ValueError(f"本地查询不支持 ee 对象作为值: {self.field}")
+        column = SQL_COLUMNS.get(self.field, f"json_extract(feature, '$.properties.\"{self.field}\"')")
+        if self.op in ("in", "not_in"):
+            values = list(self.value)
+            placeholders = ", ".join("?" * len(values)) or "NULL"
+            keyword = "IN" if self.op == "in" else "NOT IN"
+            return f"{column} {keyword} ({placeholders})", values
+        return f"{column} {SQL_OPS[self.op]} ?", [self.value]
@@ -10,6 +10,7 @@ class ConditionBuilder:
     def __init__(self):
         self.conditions = []
         self.temp_filter = None
+        self.combinator = None
 
     def add(self, field, op, value):
         """添加一个条件"""
@@ -19,14 +20,31 @@ class ConditionBuilder:
     def and_(self):
         """构造 AND 过滤器"""
         self.temp_filter = ee.Filter.And([c.filter for c in self.conditions])
+        self.combinator = "AND"
         return self
 
     def or_(self):
         """构造 OR 过滤器"""
         self.temp_filter = ee.Filter.Or([c.filter for c in self.conditions])
+        self.combinator = "OR"
         return self
 
-
+    def to_sql(self):
+        """返回与 build() 等价的本地目录查询条件 (where, params)，组合方式与 and_() / or_() 一致"""
+        if self.combinator is None and len(self.conditions) != 1:
+            raise ValueError("请先调用 and_() 或 or_() 来组合条件")
+        clauses, params = [], []
+        for condition in self.conditions:
+            sql = condition.to_sql()
+            if sql is None:
+                if self.combinator == "OR":
+                    return "1", []
+                continue
+            clauses.append(f"({sql[0]})")
+            params.extend(sql[1])
+        if not clauses:
+            return "1", []
+        return f" {self.combinator or 'AND'} ".join(clauses), params
 
     def build(self):
         """返回组合后的 ee.Filter"""
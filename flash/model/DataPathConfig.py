@@ -26,8 +26,24 @@ class DataPathConfig:
     def roi_path(self):
         return os.path.join(self.thumbnail_path, self.roi_name)
 
+    @property
+    def thumbnail_cache_path(self):
+        """内容寻址的缩略图缓存目录，所有 ROI 共用"""
+        return os.path.join(self.thumbnail_path, 'cache')
+
+    @property
+    def catalog_path(self):
+        """本地影像元数据目录（SQLite），所有 ROI 共用"""
+        return os.path.join(self.base_path, 'scene_catalog.sqlite')
+
     @property
     def mosaic_path(self):
         return os.path.join(self.roi_path, 'mosaic')
+
+    @property
+    def mosaic_result_store_path(self):
+        """已生成镶嵌结果的索引（SQLite），与镶嵌输出放在一起"""
+        return os.path.join(self.mosaic_path, 'results.sqlite')
+
     def all_not_empty(self):
         return all([self.base_path, self.roi_name, self.gdal_bin_path]) and self.download_path is not None
\ No newline at end of file
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/19 9:30
+from datetime import datetime, timezone
+from typing import Iterable, List
+
+from flash.model.Sentinel2Image import Sentinel2Image
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+
+
+def datatake_key(image: Sentinel2Image):
+    """同一卫星、同一相对轨道、同一方向、同一天的影像属于同一次数据获取（datatake）"""
+    sensing_date = None
+    if image.system_time_start is not None:
+        sensing_date = datetime.fromtimestamp(image.system_time_start / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+    direction = image.SENSING_ORBIT_DIRECTION.value if image.SENSING_ORBIT_DIRECTION else None
+    return image.SPACECRAFT_NAME, image.SENSING_ORBIT_NUMBER, direction, sensing_date
+
+
+class Datatake:
+    """一次数据获取覆盖的多个 tile 影像，同一天同一轨道，拼接无缝"""
+
+    def __init__(self, key, items: List[Sentinel2TileItem]):
+        self.key = key
+        self.items = items
+
+    @property
+    def tiles(self):
+        return sorted({item.tile for item in self.items})
+
+    def __str__(self):
+        spacecraft, orbit, direction, sensing_date = self.key
+        return f"Datatake({spacecraft}_R{orbit}_{direction}_{sensing_date}, tiles={self.tiles})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def group_by_datatake(items: Iterable[Sentinel2TileItem]) -> List[Datatake]:
+    """将 tile 影像聚合为 datatake"""
+    groups = {}
+    for item in items:
+        groups.setdefault(datatake_key(item.sentinel2Image), []).append(item)
+    return [Datatake(key, group) for key, group in groups.items()]
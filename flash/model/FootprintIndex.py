@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/20 10:05
+from typing import Dict, Iterable, List
+
+from shapely import STRtree
+from shapely.ops import unary_union
+
+from flash.model.Sentinel2Image import Sentinel2Image
+from flash.model.VectorFile import VectorFile
+from flash.util.coverage_util import FOOTPRINT_PROPERTY, footprint_to_polygon, roi_union_geometry
+
+
+class FootprintIndex:
+    """
+    影像足迹空间索引（STRtree），在提交 GEE 之前做几何预筛：
+
+    - 与 ROI 相交面积可忽略的影像直接剔除；
+    - 足迹并集覆盖不了 ROI 的组合直接拒绝。
+
+    没有 system:footprint 的影像无法本地判断，一律放行交给服务器端计算。
+    """
+
+    def __init__(self, images: Iterable[Sentinel2Image], roi: VectorFile, min_intersection_ratio=0.001):
+        self.roi_geometry = roi_union_geometry(roi)
+        self.roi_area = self.roi_geometry.area
+        self.min_intersection_ratio = min_intersection_ratio
+
+        self.unknown_ids = set()
+        ids, polygons = [], []
+        for image in images:
+            polygon = footprint_to_polygon(image.properties.get(FOOTPRINT_PROPERTY))
+            if polygon is None:
+                self.unknown_ids.add(image.id)
+            else:
+                ids.append(image.id)
+                polygons.append(polygon)
+        self.tree = STRtree(polygons)
+
+        # 只保留与 ROI 相交部分，后续并集只在 ROI 范围内计算
+        self.clipped: Dict[str, object] = {}
+        for i in self.tree.query(self.roi_geometry, predicate='intersects'):
+            self.clipped[ids[i]] = polygons[i].intersection(self.roi_geometry)
+
+    def intersection_ratio(self, scene_id: str) -> float:
+        """影像与 ROI 相交面积占 ROI 面积的比例"""
+        if scene_id in self.unknown_ids or self.roi_area == 0:
+            return 1.0
+        clipped = self.clipped.get(scene_id)
+        return clipped.area / self.roi_area if clipped is not None else 0.0
+
+    def is_relevant(self, scene_id: str) -> bool:
+        return self.intersection_ratio(scene_id) >= self.min_intersection_ratio
+
+    def relevant_images(self, images: Iterable[Sentinel2Image]) -> List[Sentinel2Image]:
+        """剔除与 ROI 相交可忽略的影像"""
+        return [image for image in images if self.is_relevant(image.id)]
+
+    def covers(self, scene_ids: Iterable[str], tolerance=0.001) -> bool:
+        """足迹并集是否覆盖 ROI（未覆盖面积不超过 tolerance，与服务器端 0.999 的判定一致）"""
+        scene_ids = list(scene_ids)
+        if self.roi_area == 0 or any(scene_id in self.unknown_ids for scene_id in scene_ids):
+            return True
+        pieces = [self.clipped[scene_id] for scene_id in scene_ids if scene_id in self.clipped]
+        if not pieces:
+            return False
+        uncovered = self.roi_geometry.difference(unary_union(pieces))
+        return uncovered.area / self.roi_area <= tolerance
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/26 9:30
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mosaic_result (
+    key        TEXT PRIMARY KEY,
+    item_ids   TEXT NOT NULL,
+    outputs    TEXT NOT NULL,
+    cost       REAL,
+    coverage   REAL,
+    cloud      REAL,
+    created_at REAL
+);
+"""
+
+
+class MosaicResultStore:
+    """
+    已生成镶嵌结果的持久化索引：规范化的影像组合（及影响输出的参数）→ 输出文件和元数据（代价、覆盖度、云量）。
+
+    每个结果交付后立即写入（SQLite 单条提交），停止或崩溃后重新搜索时，已完成的组合直接从这里返回，不再合成。
+    输出文件被删除的条目视为未命中。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self):
+        # 每次操作单独连接，可以在任意线程中调用
+        return sqlite3.connect(self.db_path)
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        """命中且输出文件都还在时返回回调输出列表 [{'thumbnail_url', 'item_ids'}]，否则返回 None"""
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT outputs FROM mosaic_result WHERE key = ?", (key,)).fetchone()
+        outputs = json.loads(row[0]) if row else None
+        if not outputs or not all(os.path.exists(output['thumbnail_url']) for output in outputs):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return outputs
+
+    def put(self, key: str, item_ids: str, outputs: List[dict], cost: float = None, coverage: float = None,
+            cloud: float = None):
+        with closing(self._connect()) as connection, connection:
+            connection.execute("INSERT OR REPLACE INTO mosaic_result VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (key, item_ids, json.dumps(outputs), cost, coverage, cloud, time.time()))
+
+    def metadata(self, key: str) -> Optional[dict]:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT item_ids, cost, coverage, cloud, created_at FROM mosaic_result WHERE key = ?",
+                (key,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('item_ids', 'cost', 'coverage', 'cloud', 'created_at'), row))
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/24 14:10
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class PrefixNode:
+    __slots__ = ('children', 'composite')
+
+    def __init__(self):
+        self.children: Dict[str, 'PrefixNode'] = {}
+        self.composite: Optional[np.ndarray] = None
+
+
+class PrefixCompositeCache:
+    """
+    按影像序列前缀组织的部分合成结果字典树：节点路径是影像 id 序列，节点上可保存该前缀的合成数组。
+
+    相邻组合共享前缀（如 (A1, B1, C1) 与 (A1, B1, C2)），新组合从最长已缓存前缀继续叠加，
+    只需绘制不同的影像。缓存的数组总大小超过预算时按最近最少使用释放，并剪掉空节点。
+
+    可在多个线程间共享：结构修改加锁，缓存的数组写入后不再修改。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.root = PrefixNode()
+        self.lru: 'OrderedDict[Tuple[str, ...], int]' = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reused_scenes = 0
+        self._lock = threading.Lock()
+
+    def longest_prefix(self, keys: Sequence[str]) -> Tuple[int, Optional[np.ndarray]]:
+        """最长的已缓存前缀，返回 (前缀长度, 合成数组)，没有时返回 (0, None)；返回的数组不可修改"""
+        with self._lock:
+            return self._longest_prefix(keys)
+
+    def _longest_prefix(self, keys: Sequence[str]) -> Tuple[int, Optional[np.ndarray]]:
+        node, length, composite = self.root, 0, None
+        for depth, key in enumerate(keys, start=1):
+            node = node.children.get(key)
+            if node is None:
+                break
+            if node.composite is not None:
+                length, composite = depth, node.composite
+        if composite is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.reused_scenes += length
+            self.lru.move_to_end(tuple(keys[:length]))
+        return length, composite
+
+    def put(self, keys: Sequence[str], composite: np.ndarray):
+        """保存前缀 keys 的合成数组（调用方不再修改该数组），超出预算时淘汰"""
+        if composite.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._put(keys, composite)
+
+    def _put(self, keys: Sequence[str], composite: np.ndarray):
+        node = self.root
+        for key in keys:
+            node = node.children.setdefault(key, PrefixNode())
+        prefix = tuple(keys)
+        if node.composite is not None:
+            self.total_bytes -= self.lru.pop(prefix)
+        node.composite = composite
+        self.lru[prefix] = composite.nbytes
+        self.total_bytes += composite.nbytes
+        while self.total_bytes > self.max_bytes:
+            oldest, size = self.lru.popitem(last=False)
+            self.total_bytes -= size
+            self._release(oldest)
+
+    def clear(self):
+        with self._lock:
+            self.root = PrefixNode()
+            self.lru.clear()
+            self.total_bytes = 0
+
+    def __getstate__(self):
+        """传给工作进程时只带预算，每个进程各自缓存"""
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'])
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'reused_scenes': self.reused_scenes,
+                'entries': len(self.lru), 'total_bytes': self.total_bytes, 'max_bytes': self.max_bytes}
+
+    def _release(self, prefix: Tuple[str, ...]):
+        """释放前缀上的数组，并自下而上剪掉既无数组也无子节点的节点"""
+        path = [self.root]
+        for key in prefix:
+            path.append(path[-1].children[key])
+        path[-1].composite = None
+        for depth in range(len(prefix), 0, -1):
+            node = path[depth]
+            if node.children or node.composite is not None:
+                break
+            del path[depth - 1].children[prefix[depth - 1]]
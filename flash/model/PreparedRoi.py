@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/22 15:10
+import ee
+
+
+class PreparedRoi:
+    """
+    预处理后的 ROI：WGS84 合并、按容差简化，坐标保留 6 位小数。
+
+    ee.Geometry / ee.FeatureCollection 只构造一次，所有 GEE 请求共用同一个小几何。
+    按要素分块的请求（如按网格分瓦片下载）使用 ee_grid_features，每个原始要素一个 Feature。
+    """
+
+    def __init__(self, content_hash: str, tolerance: float, geometry, geojson: dict, feature_geojsons: list = None):
+        self.content_hash = content_hash
+        self.tolerance = tolerance
+        self.geometry = geometry  # shapely，简化后
+        self.geojson = geojson  # 紧凑 GeoJSON
+        self.feature_geojsons = feature_geojsons or [geojson]  # 每个原始要素的紧凑 GeoJSON（不合并、不简化）
+        self._ee_geometry = None
+        self._ee_feature_collection = None
+        self._ee_grid_features = None
+
+    @property
+    def cache_key(self) -> str:
+        """依赖 ROI 几何的缓存（如裁剪后的影像边界）使用的键"""
+        return f'{self.content_hash}:{self.tolerance}'
+
+    @property
+    def ee_geometry(self) -> ee.Geometry:
+        if self._ee_geometry is None:
+            self._ee_geometry = ee.Geometry(self.geojson, None, False)
+        return self._ee_geometry
+
+    @property
+    def ee_feature_collection(self) -> ee.FeatureCollection:
+        """与 geemap.shp_to_ee 返回类型一致，供需要 FeatureCollection 的旧调用使用"""
+        if self._ee_feature_collection is None:
+            self._ee_feature_collection = ee.FeatureCollection([ee.Feature(self.ee_geometry)])
+        return self._ee_feature_collection
+
+    @property
+    def ee_grid_features(self) -> ee.FeatureCollection:
+        """与 geemap.gdf_to_ee(roi.gdf) 一致：每个原始要素（网格单元）一个 Feature"""
+        if self._ee_grid_features is None:
+            self._ee_grid_features = ee.FeatureCollection(
+                [ee.Feature(ee.Geometry(geojson, None, False)) for geojson in self.feature_geojsons])
+        return self._ee_grid_features
@@ -7,6 +7,8 @@ import dataclasses
 import ee
 import geemap
 
+from flash.util.vector_util import prepare_roi
+
 @dataclasses.dataclass
 class RemoteSensingImage(abc.ABC):
     # 通用元信息
@@ -19,7 +21,7 @@ class RemoteSensingImage(abc.ABC):
 
 
     def area_eq_roi(self):
-        roi = geemap.shp_to_ee(self.roi.file_path).geometry()
+        roi = prepare_roi(self.roi).ee_geometry
         # 求 ROI 中未被影像覆盖的区域
         img = ee.Image(self.id)
         uncovered = roi.difference(img.geometry(), 1)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/19 16:10
+from typing import Dict, Iterable, List, Sequence
+
+import ee
+import numpy as np
+import rasterio
+import shapely
+from rasterio.transform import rowcol
+
+from flash.model.VectorFile import VectorFile
+from flash.util.coverage_util import build_roi_grid_points, footprint_to_polygon
+
+MASK_SOURCE_FOOTPRINT = 'footprint'
+MASK_SOURCE_THUMBNAIL = 'thumbnail'
+MASK_SOURCE_SERVER = 'server'
+MASK_SOURCE_LIST = [MASK_SOURCE_FOOTPRINT, MASK_SOURCE_THUMBNAIL, MASK_SOURCE_SERVER]
+
+# 0-255 每个字节中 1 的个数
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+
+class SceneMaskTable:
+    """
+    影像有效像素掩码表：ROI 固定网格上每景影像一行压缩位集（np.packbits）。
+
+    掩码只计算一次，任意组合的覆盖度 = 各行按位或后数 1 的个数，可向量化一次筛选成千上万个组合。
+    """
+
+    def __init__(self, xs: np.ndarray, ys: np.ndarray):
+        self.xs = xs
+        self.ys = ys
+        self.point_count = len(xs)
+        self.byte_count = (self.point_count + 7) // 8
+        self.index: Dict[str, int] = {}
+        self._rows: List[np.ndarray] = []
+        self._matrix = None
+
+    @classmethod
+    def from_roi(cls, roi: VectorFile, grid_size=64):
+        return cls(*build_roi_grid_points(roi, grid_size))
+
+    def __contains__(self, scene_id):
+        return scene_id in self.index
+
+    def __len__(self):
+        return len(self._rows)
+
+    # ---------- 掩码来源 ----------
+    def add_bools(self, scene_id: str, bools):
+        """按网格点布尔值写入一行，已存在时覆盖"""
+        row = np.packbits(np.asarray(bools, dtype=bool), bitorder='little')
+        if scene_id in self.index:
+            self._rows[self.index[scene_id]] = row
+        else:
+            self.index[scene_id] = len(self._rows)
+            self._rows.append(row)
+        self._matrix = None
+
+    def add_footprint(self, scene_id: str, footprint):
+        """来自 system:footprint；没有足迹时乐观地视为全覆盖"""
+        polygon = footprint_to_polygon(footprint)
+        if polygon is None:
+            self.add_bools(scene_id, np.ones(self.point_count, dtype=bool))
+        else:
+            self.add_bools(scene_id, shapely.contains_xy(polygon, self.xs, self.ys))
+
+    def add_valid_mask(self, scene_id: str, valid: np.ndarray, transform):
+        """来自栅格化的有效像素掩码（如数据立方体的 valid 平面），网格点落在栅格外视为无数据"""
+        rows, cols = rowcol(transform, self.xs, self.ys)
+        rows, cols = np.asarray(rows), np.asarray(cols)
+        inside = (rows >= 0) & (rows < valid.shape[0]) & (cols >= 0) & (cols < valid.shape[1])
+        bools = np.zeros(self.point_count, dtype=bool)
+        bools[inside] = valid[rows[inside], cols[inside]] > 0
+        self.add_bools(scene_id, bools)
+
+    def add_thumbnail_alpha(self, scene_id: str, tif_path: str):
+        """来自已下载缩略图的有效像素（alpha / nodata）"""
+        with rasterio.open(tif_path) as dataset:
+            self.add_valid_mask(scene_id, dataset.dataset_mask(), dataset.transform)
+
+    def add_from_server(self, scene_ids: Sequence[str], scale=20) -> List[str]:
+        """
+        一次 getInfo：在服务器端对所有影像批量采样网格点上的有效掩码。
+
+        :return: 采样结果与网格点数不一致、没有写入的影像 id（由调用方改用足迹掩码）
+        """
+        points = ee.FeatureCollection([ee.Feature(ee.Geometry.Point([float(x), float(y)]), {'i': i})
+                                       for i, (x, y) in enumerate(zip(self.xs, self.ys))])
+
+        def sample(scene_id):
+            # 足迹外的点 mask() 无值，aggregate_array 会丢掉这些要素导致位错位；unmask 到全球范围后每个点都有值
+            sampled = ee.Image(scene_id).select(0).mask().unmask(0, False).rename('valid').reduceRegions(
+                collection=points, reducer=ee.Reducer.first(), scale=scale)
+            return sampled.sort('i').aggregate_array('first')
+
+        values = ee.List(list(scene_ids)).map(sample).getInfo()
+        failed = []
+        for scene_id, row in zip(scene_ids, values):
+            if row is None or len(row) != self.point_count:
+                failed.append(scene_id)
+                continue
+            self.add_bools(scene_id, [bool(v) for v in row])
+        return failed
+
+    # ---------- 位集运算 ----------
+    @property
+    def matrix(self) -> np.ndarray:
+        """(景数 + 1, 字节数)，最后一行全 0，用作变长组合的填充"""
+        if self._matrix is None:
+            rows = self._rows + [np.zeros(self.byte_count, dtype=np.uint8)]
+            self._matrix = np.vstack(rows)
+        return self._matrix
+
+    def mask_int(self, scene_id: str) -> int:
+        """单景掩码转为 Python 整数位集，第 i 位对应第 i 个网格点"""
+        return int.from_bytes(self._rows[self.index[scene_id]].tobytes(), 'little')
+
+    def rows_for(self, combinations: Iterable[Sequence[str]]) -> np.ndarray:
+        """组合（影像 id 序列）转为行号矩阵，长度不足的用全 0 行填充"""
+        combinations = list(combinations)
+        width = max((len(combo) for combo in combinations), default=0)
+        padding = len(self._rows)
+        rows = np.full((len(combinations), width), padding, dtype=np.int64)
+        for k, combo in enumerate(combinations):
+            rows[k, :len(combo)] = [self.index[scene_id] for scene_id in combo]
+        return rows
+
+    def union(self, rows: np.ndarray) -> np.ndarray:
+        """每个组合的并集位集：(组合数, 字节数)"""
+        if rows.shape[1] == 0:
+            return np.zeros((rows.shape[0], self.byte_count), dtype=np.uint8)
+        return np.bitwise_or.reduce(self.matrix[rows], axis=1)
+
+    def coverage_ratio(self, rows: np.ndarray) -> np.ndarray:
+        """每个组合覆盖的网格点比例"""
+        if self.point_count == 0:
+            return np.ones(rows.shape[0])
+        return _POPCOUNT[self.union(rows)].sum(axis=1) / self.point_count
+
+    def covers(self, rows: np.ndarray, threshold=0.999) -> np.ndarray:
+        """每个组合是否覆盖 ROI（与服务器端 0.999 的判定一致）"""
+        return self.coverage_ratio(rows) >= threshold
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/22 9:15
+from itertools import groupby
+from operator import attrgetter
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from flash.model.Sentinel2Image import CLOUDY_PIXEL_PERCENTAGE, OrbitDirection
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+from flash.model.VectorFile import VectorFile
+from flash.util.coverage_util import FOOTPRINT_PROPERTY
+
+# 整数列中表示缺失值
+INT_NONE = np.iinfo(np.int64).min
+
+
+def _int_column(values) -> np.ndarray:
+    return np.array([INT_NONE if v is None else int(v) for v in values], dtype=np.int64)
+
+
+def _float_column(values) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def _direction(value):
+    if value is None or isinstance(value, OrbitDirection):
+        return value
+    try:
+        return OrbitDirection(value)
+    except ValueError:
+        return None
+
+
+class SceneRow:
+    """
+    SceneTable 中一行的轻量视图，属性名与 Sentinel2Image 一致，现有调用方无需修改。
+
+    只保存 (表, 行号)，不复制数据。
+    """
+    __slots__ = ('table', 'index')
+
+    type = 'Image'
+
+    def __init__(self, table: 'SceneTable', index: int):
+        self.table = table
+        self.index = index
+
+    def _int(self, column):
+        value = column[self.index]
+        return None if value == INT_NONE else int(value)
+
+    @property
+    def id(self) -> str:
+        return self.table.id[self.index]
+
+    @property
+    def MGRS_TILE(self) -> str:
+        return str(self.table.tile[self.index]) or None
+
+    @property
+    def CLOUDY_PIXEL_PERCENTAGE(self) -> float:
+        value = self.table.cloud[self.index]
+        return None if np.isnan(value) else float(value)
+
+    @property
+    def system_time_start(self) -> int:
+        return self._int(self.table.time_start)
+
+    @property
+    def system_time_end(self) -> int:
+        return self._int(self.table.time_end)
+
+    @property
+    def SENSING_ORBIT_NUMBER(self) -> int:
+        return self._int(self.table.orbit_number)
+
+    @property
+    def SENSING_ORBIT_DIRECTION(self) -> OrbitDirection:
+        return self.table.orbit_direction[self.index]
+
+    @property
+    def SPACECRAFT_NAME(self) -> str:
+        return self.table.spacecraft[self.index]
+
+    @property
+    def PROCESSING_BASELINE(self) -> str:
+        return self.table.baseline[self.index]
+
+    @property
+    def GENERATION_TIME(self) -> int:
+        return self._int(self.table.generation_time)
+
+    @property
+    def system_asset_size(self) -> int:
+        return self._int(self.table.asset_size)
+
+    @property
+    def roi(self) -> VectorFile:
+        return self.table.roi
+
+    @property
+    def properties(self) -> dict:
+        """只包含表中保存的属性（含足迹），不再保留完整属性字典"""
+        return {
+            'MGRS_TILE': self.MGRS_TILE,
+            CLOUDY_PIXEL_PERCENTAGE: self.CLOUDY_PIXEL_PERCENTAGE,
+            'system:time_start': self.system_time_start,
+            'system:time_end': self.system_time_end,
+            FOOTPRINT_PROPERTY: self.table.footprint[self.index],
+        }
+
+    def sort_key(self):
+        return CLOUDY_PIXEL_PERCENTAGE
+
+    def __repr__(self):
+        return f"SceneRow(id={self.id}, tile={self.MGRS_TILE}, cloud={self.CLOUDY_PIXEL_PERCENTAGE})"
+
+
+class SceneTable:
+    """
+    列式影像元数据表：每个字段一个 NumPy 数组，不保存波段信息和完整属性字典。
+
+    按 tile 分组是数组运算；需要对象时用 rows() 取 SceneRow 视图。
+    """
+
+    def __init__(self, id, tile, cloud, time_start, time_end, orbit_number, orbit_direction,
+                 spacecraft, baseline, generation_time, asset_size, footprint, roi: VectorFile = None):
+        self.id = np.asarray(id, dtype=object)
+        self.tile = np.asarray(tile, dtype=str)
+        self.cloud = cloud
+        self.time_start = time_start
+        self.time_end = time_end
+        self.orbit_number = orbit_number
+        self.orbit_direction = np.asarray(orbit_direction, dtype=object)
+        self.spacecraft = np.asarray(spacecraft, dtype=object)
+        self.baseline = np.asarray(baseline, dtype=object)
+        self.generation_time = generation_time
+        self.asset_size = asset_size
+        self.footprint = np.asarray(footprint, dtype=object)
+        self.roi = roi
+
+    # ---------- 构造 ----------
+    @classmethod
+    def from_columns(cls, columns: Dict[str, list], roi: VectorFile = None) -> 'SceneTable':
+        """来自按列获取的元数据（fetch_collection_columns）"""
+        count = len(columns.get('system:id', []))
+
+        def column(name):
+            return columns.get(name) or [None] * count
+
+        return cls(
+            id=column('system:id'),
+            tile=[t or '' for t in column('MGRS_TILE')],
+            cloud=_float_column(column(CLOUDY_PIXEL_PERCENTAGE)),
+            time_start=_int_column(column('system:time_start')),
+            time_end=_int_column(column('system:time_end')),
+            orbit_number=_int_column(column('SENSING_ORBIT_NUMBER')),
+            orbit_direction=[_direction(v) for v in column('SENSING_ORBIT_DIRECTION')],
+            spacecraft=column('SPACECRAFT_NAME'),
+            baseline=column('PROCESSING_BASELINE'),
+            generation_time=_int_column(column('GENERATION_TIME')),
+            asset_size=_int_column(column('system:asset_size')),
+            footprint=column(FOOTPRINT_PROPERTY),
+            roi=roi)
+
+    @classmethod
+    def from_features(cls, features: Sequence[dict], roi: VectorFile = None) -> 'SceneTable':
+        """来自 getInfo / 本地目录中的 Image 结构，丢弃波段信息"""
+        names = ['MGRS_TILE', CLOUDY_PIXEL_PERCENTAGE, 'system:time_start', 'system:time_end',
+                 'SENSING_ORBIT_NUMBER', 'SENSING_ORBIT_DIRECTION', 'SPACECRAFT_NAME', 'PROCESSING_BASELINE',
+                 'GENERATION_TIME', 'system:asset_size', FOOTPRINT_PROPERTY]
+        columns = {name: [feature.get('properties', {}).get(name) for feature in features] for name in names}
+        columns['system:id'] = [feature.get('id') for feature in features]
+        return cls.from_columns(columns, roi)
+
+    # ---------- 行视图 ----------
+    def __len__(self):
+        return len(self.id)
+
+    def row(self, index: int) -> SceneRow:
+        return SceneRow(self, int(index))
+
+    def rows(self, indices: Iterable[int] = None) -> List[SceneRow]:
+        indices = range(len(self)) if indices is None else indices
+        return [SceneRow(self, int(i)) for i in indices]
+
+    # ---------- 向量化运算 ----------
+    def group_by_tile(self, indices: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """
+        按 tile 分组，tile 升序，组内保持原顺序（与 sorted + groupby 结果一致）。
+
+        :param indices: 只对这些行分组，返回的是 indices 中的位置；None 表示整张表，返回行号
+        """
+        tiles = self.tile if indices is None else self.tile[indices]
+        order = np.argsort(tiles, kind='stable')
+        keys, starts = np.unique(tiles[order], return_index=True)
+        return dict(zip(keys.tolist(), np.split(order, starts[1:])))
+
+
+def _tile_item(tile, image) -> Sentinel2TileItem:
+    return Sentinel2TileItem(tile=tile, id=image.id, start_date=image.system_time_start,
+                             end_date=image.system_time_end, sentinel2Image=image)
+
+
+def group_tile_items(images: Sequence) -> Dict[str, List[Sentinel2TileItem]]:
+    """
+    按 MGRS_TILE 分组并包装为 Sentinel2TileItem，tile 升序，组内保持原顺序。
+
+    都是同一张 SceneTable 的行时直接在表的 tile 列上排序分组，不复制表；其他输入按属性排序后 groupby
+    """
+    images = list(images)
+    if images and all(isinstance(image, SceneRow) for image in images) \
+            and len({id(image.table) for image in images}) == 1:
+        table = images[0].table
+        indices = np.fromiter((image.index for image in images), dtype=np.int64, count=len(images))
+        return {tile: [_tile_item(tile, images[i]) for i in positions.tolist()]
+                for tile, positions in table.group_by_tile(indices).items()}
+    sorted_images = sorted(images, key=attrgetter('MGRS_TILE'))
+    return {tile: [_tile_item(tile, image) for image in group]
+            for tile, group in groupby(sorted_images, key=attrgetter('MGRS_TILE'))}
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/21 9:40
+import dataclasses
+import time
+from typing import Optional
+
+
+@dataclasses.dataclass
+class SearchBudget:
+    """
+    搜索预算：结果配额、质量阈值、墙钟时限，任一满足即停止。
+
+    组合按代价升序产出，因此提前停止时已得到的就是目前最优的结果。
+    """
+    result_quota: Optional[int] = None  # 得到 K 个覆盖镶嵌后停止
+    quality_threshold: Optional[float] = None  # 组合代价超过该值后停止（后面只会更差）
+    deadline_seconds: Optional[float] = None  # 从 start() 起的墙钟时限
+
+    def __post_init__(self):
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+
+    def elapsed(self) -> float:
+        return 0.0 if self.started_at is None else time.monotonic() - self.started_at
+
+    def is_expired(self) -> bool:
+        return self.deadline_seconds is not None and self.elapsed() >= self.deadline_seconds
+
+    def is_quota_reached(self, result_count: int) -> bool:
+        return self.result_quota is not None and result_count >= self.result_quota
+
+    def accepts(self, cost: float) -> bool:
+        return self.quality_threshold is None or cost <= self.quality_threshold
+
+    def stop_reason(self, result_count: int, cost: float = None) -> Optional[str]:
+        """需要停止时返回原因，否则返回 None"""
+        if self.is_quota_reached(result_count):
+            return f"已得到 {result_count} 个结果，达到配额"
+        if cost is not None and not self.accepts(cost):
+            return f"组合代价 {cost:.2f} 超过质量阈值 {self.quality_threshold}"
+        if self.is_expired():
+            return f"已用时 {self.elapsed():.1f}s，达到时限"
+        return None
@@ -1,9 +1,11 @@
 import dataclasses
 from typing import Optional
 
+from flash.model.CombinationCost import CombinationCost
 from flash.model.DataPathConfig import DataPathConfig
 from flash.model.DataSourceConfigure import DataSourceConfigure
-from flash.model.VectorFile import VectorFile
+from flash.model.SearchBudget import SearchBudget
+from flash.model.VectorFile import VectorFile, DEFAULT_SIMPLIFY_TOLERANCE
 
 
 # -*- coding: utf-8 -*-
@@ -14,6 +16,63 @@ from flash.model.VectorFile import VectorFile
 class Sentinel2DataSourceConfigure(DataSourceConfigure):
     s2_sr_harmonized: str = 'COPERNICUS/S2_SR_HARMONIZED'
     cloud_coverage: Optional[float] = None
+    # 镶嵌组合搜索模式：greedy / branch_and_bound
+    search_mode: str = 'branch_and_bound'
+    # 搜索单元：tile（单景影像）/ datatake（同日同轨整次获取，单 tile 补齐）
+    search_unit: str = 'datatake'
+    # 本地覆盖判断时 ROI 网格的划分数（按长边）
+    coverage_grid_size: int = 64
+    # 本地覆盖掩码来源：footprint（元数据足迹）/ thumbnail（缩略图 alpha）/ server（一次批量服务器采样）
+    coverage_mask_source: str = 'footprint'
+    # 组合代价权重：云量、景数、时间跨度（每天）
+    cloud_cost_weight: float = 1.0
+    tile_count_cost_weight: float = 5.0
+    date_spread_cost_weight: float = 0.5
+    # 组合内影像的最大时间跨度（天），None 表示不限制
+    max_date_spread_days: Optional[float] = None
+    # 服务器端组合枚举顺序：ranked_order 时代价最低的 ranked_limit 个组合按代价升序产出，其余按字典序流式产出；
+    # ranked_limit 为 None 时全部按代价排序（内存随输出增长），ranked_order 为 False 时全部字典序（内存恒定）
+    ranked_order: bool = True
+    ranked_limit: Optional[int] = 1000
+    # 合成模式：mosaic（后面的影像覆盖前面的）/ quality（逐像素按质量分合成，与顺序无关）
+    composite_mode: str = 'mosaic'
+    # 质量分来源：scl / cloud_probability
+    quality_source: str = 'scl'
+    # 同一 tile 同一成像时间的重复产品去重策略：latest_generation / latest_baseline / none
+    dedup_policy: str = 'latest_generation'
+    # 元数据获取方式：columns（只取用到的属性列，分页）/ full（整体 getInfo）
+    metadata_fetch_mode: str = 'columns'
+    metadata_page_size: int = 2000
+    # 缩略图获取方式：pixels（computePixels 直接取数组写 tif，地理参考精确）/ png（下载 PNG 再转 tif）
+    thumbnail_fetch_mode: str = 'pixels'
+    # 缩略图并发下载：线程数、单次请求超时（秒，png 方式）
+    thumbnail_workers: int = 8
+    thumbnail_timeout_seconds: float = 120
+    # 缩略图缓存的磁盘预算（MB），超出后按最近最少使用淘汰
+    thumbnail_cache_max_mb: float = 2048
+    # 缩略图范围：roi（按 ROI 裁剪后获取）/ scene（整景获取一次放入共享缓存，本地按 ROI 掩码裁剪，相邻 ROI 复用）
+    thumbnail_extent: str = 'roi'
+    # scene 范围缩略图的统一格网分辨率（度），所有影像、所有 ROI 共用同一格网
+    scene_thumbnail_resolution: float = 0.001
+    # ROI 提交 GEE 前的简化容差（度），0 表示不简化
+    roi_simplify_tolerance: float = DEFAULT_SIMPLIFY_TOLERANCE
+    # 镶嵌引擎：memory（进程内 NumPy 合成，缩略图数组读一次后复用）/ gdal（每个组合调用 GDAL 子进程）
+    mosaic_engine: str = 'memory'
+    # memory 引擎是否同时写出 GeoTIFF（关闭时只写预览 PNG）
+    mosaic_write_geotiff: bool = True
+    # memory 引擎按影像序列前缀缓存部分合成结果的内存预算（MB），0 表示不缓存
+    mosaic_prefix_cache_mb: float = 512
+    # 镶嵌并发：thread（线程池）/ process（进程池）；线程/进程数，None 表示 CPU 核数
+    mosaic_pool: str = 'thread'
+    mosaic_workers: Optional[int] = None
+    # 复用已生成的镶嵌结果（按影像组合和合成参数索引），停止或崩溃后重新搜索时不再重复合成
+    use_mosaic_result_cache: bool = True
+    # 启用本地影像元数据目录（SQLite，增量刷新）
+    use_scene_catalog: bool = True
+    # 提前终止：得到 K 个覆盖镶嵌 / 组合代价超过阈值 / 超过墙钟时限（秒）即停止，None 表示不限制
+    result_quota: Optional[int] = None
+    quality_threshold: Optional[float] = None
+    search_deadline_seconds: Optional[float] = None
 
     def __post_init__(self):
         self.data_path_config = DataPathConfig()
@@ -29,8 +88,42 @@ class Sentinel2DataSourceConfigure(DataSourceConfigure):
     def set_batch_size(self, batch_size: int):
         self.batch_size = batch_size
 
+    def combination_cost(self) -> CombinationCost:
+        return CombinationCost(cloud_weight=self.cloud_cost_weight,
+                               tile_count_weight=self.tile_count_cost_weight,
+                               date_spread_weight=self.date_spread_cost_weight)
+
+    def search_budget(self) -> SearchBudget:
+        return SearchBudget(result_quota=self.result_quota,
+                            quality_threshold=self.quality_threshold,
+                            deadline_seconds=self.search_deadline_seconds)
+
+    def set_search_budget(self, result_quota: Optional[int] = None, quality_threshold: Optional[float] = None,
+                          search_deadline_seconds: Optional[float] = None):
+        self.result_quota = result_quota
+        self.quality_threshold = quality_threshold
+        self.search_deadline_seconds = search_deadline_seconds
+
+    def set_max_date_spread_days(self, max_date_spread_days: Optional[float]):
+        self.max_date_spread_days = max_date_spread_days
+
+    def set_ranked_order(self, ranked_order: bool, ranked_limit: Optional[int] = 1000):
+        self.ranked_order = ranked_order
+        self.ranked_limit = ranked_limit
+
+    def set_search_mode(self, search_mode: str):
+        self.search_mode = search_mode
+
+    def set_composite_mode(self, composite_mode: str):
+        self.composite_mode = composite_mode
+
+    def set_roi_simplify_tolerance(self, roi_simplify_tolerance: float):
+        self.roi_simplify_tolerance = roi_simplify_tolerance
+        if self.roi is not None:
+            self.roi.simplify_tolerance = roi_simplify_tolerance
+
     def set_roi(self, roi_file_path: str):
-        self.roi = VectorFile(roi_file_path)
+        self.roi = VectorFile(roi_file_path, self.roi_simplify_tolerance)
 
     def __str__(self):
         return (f'Sentinel2DataSourceConfigure(satellite_type={self.satellite_type},'
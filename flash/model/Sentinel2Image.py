@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from typing import Union
 
 import ee
@@ -10,6 +10,16 @@ from flash.model.SentinelImage import SentinelImage
 from flash.model.VectorFile import VectorFile
 
 CLOUDY_PIXEL_PERCENTAGE = 'CLOUDY_PIXEL_PERCENTAGE'
+# 下游实际用到的属性列，按列获取元数据时只取这些
+METADATA_COLUMNS = [
+    'system:id', CLOUDY_PIXEL_PERCENTAGE, 'SPACECRAFT_NAME', 'SENSING_ORBIT_DIRECTION', 'SENSING_ORBIT_NUMBER',
+    'MGRS_TILE', 'PROCESSING_BASELINE', 'GENERATION_TIME', 'system:asset_size',
+    'system:time_start', 'system:time_end', 'system:footprint',
+]
+# 元数据获取方式：columns 只取 METADATA_COLUMNS、分页聚合；full 整体 getInfo（含全部波段和属性）
+METADATA_FETCH_COLUMNS = 'columns'
+METADATA_FETCH_FULL = 'full'
+METADATA_FETCH_MODE_LIST = [METADATA_FETCH_COLUMNS, METADATA_FETCH_FULL]
 
 
 # ========== 基础结构 ==========
@@ -119,3 +129,58 @@ def parse_any(info: dict,roi:VectorFile) -> Union[Sentinel2Image, List[Sentinel2
         return parse_sentinel2_metadata(info,roi)
     else:
         raise ValueError(f"不支持的类型: {info.get('type')}")
+
+
+def columns_to_features(columns: Dict[str, list]) -> List[dict]:
+    """按列获取的元数据（{列名: 等长列表}）转为 getInfo 中的 Image 结构，没有 bands"""
+    ids = columns.get('system:id', [])
+    features = []
+    for i, image_id in enumerate(ids):
+        properties = {name: values[i] for name, values in columns.items()
+                      if name != 'system:id' and values[i] is not None}
+        features.append({'type': 'Image', 'id': image_id, 'properties': properties})
+    return features
+
+
+# ========== 重复产品去重 ==========
+DEDUP_LATEST_GENERATION = 'latest_generation'
+DEDUP_LATEST_BASELINE = 'latest_baseline'
+DEDUP_NONE = 'none'
+DEDUP_POLICY_LIST = [DEDUP_LATEST_GENERATION, DEDUP_LATEST_BASELINE, DEDUP_NONE]
+
+
+def _baseline_version(baseline: str):
+    """'05.09' -> (5, 9)，无法解析时排最前"""
+    try:
+        return tuple(int(part) for part in str(baseline).split('.'))
+    except (TypeError, ValueError):
+        return ()
+
+
+def deduplicate_sentinel2_images(images: List[Sentinel2Image],
+                                 policy: str = DEDUP_LATEST_GENERATION) -> Tuple[List[Sentinel2Image], int]:
+    """
+    同一 tile、同一成像时间的多个产品（处理基线或生成时间不同）只保留一个。
+
+    :param policy: latest_generation 保留 GENERATION_TIME 最新的；
+                   latest_baseline 保留 PROCESSING_BASELINE 最高的（相同再比生成时间）；
+                   none 不去重
+    :return: (保留的影像, 被去掉的数量)
+    """
+    if policy not in DEDUP_POLICY_LIST:
+        raise ValueError(f"不支持的去重策略: {policy}")
+    if policy == DEDUP_NONE:
+        return images, 0
+
+    def rank(image: Sentinel2Image):
+        generation = image.GENERATION_TIME or 0
+        if policy == DEDUP_LATEST_BASELINE:
+            return _baseline_version(image.PROCESSING_BASELINE), generation
+        return generation, _baseline_version(image.PROCESSING_BASELINE)
+
+    kept = {}
+    for image in images:
+        key = (image.MGRS_TILE, image.system_time_start)
+        if key not in kept or rank(image) > rank(kept[key]):
+            kept[key] = image
+    return list(kept.values()), len(images) - len(kept)
@@ -8,9 +8,20 @@ from flash.model.TileGroup import TileGroup
 
 
 class Sentinel2TileItem(TileGroup):
-    def __init__(self, tile: str, id: str = None, start_date: str = None, end_date: str = None,
+    __slots__ = ('start_millis', 'end_millis', 'sentinel2Image')
+
+    def __init__(self, tile: str, id: str = None, start_date: int = None, end_date: int = None,
                  sentinel2Image: Sentinel2Image = None):
         super().__init__(tile, id)
-        self.start_date = datetime.fromtimestamp(start_date / 1000).strftime("%Y-%m-%d")
-        self.end_date = datetime.fromtimestamp(end_date / 1000).strftime("%Y-%m-%d")
+        # 只保存毫秒时间戳，日期字符串在用到时才格式化
+        self.start_millis = start_date
+        self.end_millis = end_date
         self.sentinel2Image = sentinel2Image
+
+    @property
+    def start_date(self) -> str:
+        return datetime.fromtimestamp(self.start_millis / 1000).strftime("%Y-%m-%d")
+
+    @property
+    def end_date(self) -> str:
+        return datetime.fromtimestamp(self.end_millis / 1000).strftime("%Y-%m-%d")
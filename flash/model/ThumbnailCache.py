@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/23 10:20
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+INDEX_FILE_NAME = 'index.json'
+
+
+class ThumbnailCache:
+    """
+    内容寻址的缩略图缓存：键由 (影像 id, 可视化参数, 尺寸, ROI 哈希, ...) 计算，与文件名、目录无关。
+
+    索引文件按最近使用顺序记录 {键: 文件大小}，总大小超过磁盘预算时淘汰最久未使用的条目。
+    缓存文件先写临时文件再改名，加载时补登索引里没有的文件（上次异常退出未保存索引），保证都会被计数和淘汰；
+    正在被读取（checkout）的条目不会被淘汰。
+    放入和取出都优先用硬链接（不同磁盘时退回复制），工作目录里的文件与缓存条目共用同一份数据。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_FILE_NAME)
+        self.entries: 'OrderedDict[str, int]' = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        ## 键 -> 正在读取的次数，淘汰时跳过
+        self._pinned = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key_for(**parts) -> str:
+        """按参数内容计算缓存键，参数顺序无关"""
+        return hashlib.md5(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.tif')
+
+    @contextmanager
+    def checkout(self, key: str):
+        """
+        命中时给出缓存文件路径并更新最近使用顺序，未命中给出 None。
+
+        with 块内该条目不会被其他线程的 put 淘汰，可以直接读取缓存文件。
+        """
+        with self._lock:
+            if key not in self.entries or not os.path.exists(self.path_for(key)):
+                self._drop(key)
+                self.misses += 1
+                path = None
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self._pinned[key] = self._pinned.get(key, 0) + 1
+                path = self.path_for(key)
+        try:
+            yield path
+        finally:
+            if path is not None:
+                with self._lock:
+                    self._pinned[key] -= 1
+                    if not self._pinned[key]:
+                        del self._pinned[key]
+
+    def get(self, key: str, target_path: str) -> bool:
+        """命中时把缓存文件链接（或复制）到 target_path 并返回 True"""
+        with self.checkout(key) as path:
+            if path is None:
+                return False
+            _link_or_copy(path, target_path)
+            return True
+
+    def put(self, key: str, source_path: str):
+        """把已生成的缩略图链接（或复制）进缓存，超出预算时淘汰最久未使用的条目"""
+        if not os.path.exists(source_path):
+            return
+        path = self.path_for(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        _link_or_copy(source_path, tmp_path)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # 同键文件正被读取（Windows 下不能替换）；键按内容计算，已有文件即是同一内容
+            os.remove(tmp_path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._drop(key)
+            self.entries[key] = size
+            self.total_bytes += size
+            self._evict()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate,
+                'entries': len(self.entries), 'total_bytes': self.total_bytes, 'max_bytes': self.max_bytes}
+
+    def save(self):
+        """写索引文件（先写临时文件再替换，避免中途退出损坏索引）"""
+        with self._lock:
+            content = json.dumps(list(self.entries.items()))
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, self.index_path)
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    items = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"缩略图缓存索引读取失败，重新建立: {e}")
+                items = []
+            for key, size in items:
+                if os.path.exists(self.path_for(key)):
+                    self.entries[key] = size
+                    self.total_bytes += size
+        self._rescan()
+        self._evict()
+
+    def _rescan(self):
+        """补登索引中没有的缓存文件（按修改时间视为最近使用），清理中断留下的临时文件"""
+        orphans = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            elif name.endswith('.tif') and name[:-len('.tif')] not in self.entries:
+                orphans.append((os.path.getmtime(path), name[:-len('.tif')], os.path.getsize(path)))
+        for _, key, size in sorted(orphans):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def _evict(self):
+        """淘汰最久未使用且没有被读取的条目，直到不超过预算（最近使用的一条始终保留）"""
+        for key in list(self.entries)[:-1]:
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            self._drop(key)
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+
+    def _drop(self, key: str):
+        size = self.entries.pop(key, None)
+        if size is not None:
+            self.total_bytes -= size
+
+
+def _link_or_copy(source_path: str, target_path: str):
+    """
+    硬链接 source_path 到 target_path，不支持硬链接（跨盘、文件系统限制）时复制。
+    先删除已有的 target_path：它可能是另一个缓存条目的硬链接，直接覆盖写会改掉缓存内容。
+    """
+    if os.path.lexists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
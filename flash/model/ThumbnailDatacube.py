@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/25 9:20
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import rasterio
+from affine import Affine
+
+from flash.util.S2_Util import read_aligned_array, union_grid
+
+CUBE_FILE_NAME = 'cube.npy'
+VALID_FILE_NAME = 'valid.npy'
+INDEX_FILE_NAME = 'index.json'
+
+
+def source_signature(tif_path: str) -> list:
+    """缩略图文件的 (修改时间, 大小)，任一变化都需要重新入库"""
+    stat = os.stat(tif_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class ThumbnailDatacube:
+    """
+    ROI 公共网格上的缩略图数据立方体：所有影像只重采样一次，保存在目录下的三个文件中
+    - cube.npy：(景, 波段, y, x) uint8 内存映射数组，波段为 R, G, B, alpha[, 质量分]
+    - valid.npy：(景, y, x) bool 有效像素掩码
+    - index.json：影像 id 顺序、网格（仿射变换、尺寸）和源文件签名
+
+    打开后只读映射，镶嵌、覆盖检查、预览都是对映射数组的切片，不复制数据，多线程、多进程共享同一份页缓存。
+    """
+
+    def __init__(self, directory: str, ids: List[str], transform: Affine, shape: Tuple[int, int],
+                 signatures: Dict[str, list]):
+        self.directory = directory
+        self.ids = ids
+        self.transform = transform
+        self.shape = tuple(shape)
+        self.signatures = signatures
+        self.index = {scene_id: i for i, scene_id in enumerate(ids)}
+        self.cube = np.load(os.path.join(directory, CUBE_FILE_NAME), mmap_mode='r')
+        self.valid = np.load(os.path.join(directory, VALID_FILE_NAME), mmap_mode='r')
+
+    # ---------- 构建与打开 ----------
+    @classmethod
+    def open(cls, directory: str) -> Optional['ThumbnailDatacube']:
+        """打开已有的数据立方体，不存在或损坏时返回 None"""
+        try:
+            with open(os.path.join(directory, INDEX_FILE_NAME), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            return cls(directory, index['ids'], Affine(*index['transform']), index['shape'], index['signatures'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"数据立方体不可用，需要重新构建: {e}")
+            return None
+
+    @classmethod
+    def for_scenes(cls, directory: str, scenes: Sequence[Tuple[str, str]]) -> Optional['ThumbnailDatacube']:
+        """网格取覆盖全部缩略图的并集网格（见 union_grid），没有缩略图时返回 None"""
+        scenes = [(scene_id, path) for scene_id, path in scenes if os.path.exists(path)]
+        grid = union_grid([path for _, path in scenes])
+        if grid is None:
+            return None
+        return cls.ensure(directory, scenes, *grid)
+
+    @classmethod
+    def ensure(cls, directory: str, scenes: Sequence[Tuple[str, str]], transform: Affine,
+               shape: Tuple[int, int]) -> 'ThumbnailDatacube':
+        """已有立方体的影像、网格、源文件都未变化时直接打开，否则重新构建"""
+        signatures = {scene_id: source_signature(path) for scene_id, path in scenes}
+        if os.path.exists(os.path.join(directory, INDEX_FILE_NAME)):
+            datacube = cls.open(directory)
+            if datacube is not None and datacube.matches([scene_id for scene_id, _ in scenes], transform, shape,
+                                                         signatures):
+                return datacube
+            if datacube is not None:
+                # 重建前释放旧映射（Windows 下被映射的文件不能覆盖）
+                datacube.close()
+        return cls.build(directory, scenes, transform, shape)
+
+    @classmethod
+    def build(cls, directory: str, scenes: Sequence[Tuple[str, str]], transform: Affine,
+              shape: Tuple[int, int]) -> 'ThumbnailDatacube':
+        """逐景对齐到网格写入内存映射文件，最后写索引（索引存在即表示立方体完整）"""
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, INDEX_FILE_NAME)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        band_count = 0
+        for _, path in scenes:
+            with rasterio.open(path) as src:
+                band_count = max(band_count, src.count)
+        height, width = shape
+        cube = np.lib.format.open_memmap(os.path.join(directory, CUBE_FILE_NAME), mode='w+', dtype=np.uint8,
+                                         shape=(len(scenes), band_count, height, width))
+        valid = np.lib.format.open_memmap(os.path.join(directory, VALID_FILE_NAME), mode='w+', dtype=bool,
+                                          shape=(len(scenes), height, width))
+        for i, (_, path) in enumerate(scenes):
+            aligned = read_aligned_array(path, transform, shape)
+            cube[i, :aligned.shape[0]] = aligned
+            valid[i] = aligned[3] > 0
+        cube.flush()
+        valid.flush()
+        del cube, valid
+
+        ids = [scene_id for scene_id, _ in scenes]
+        signatures = {scene_id: source_signature(path) for scene_id, path in scenes}
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'ids': ids, 'transform': list(transform)[:6], 'shape': list(shape),
+                       'band_count': band_count, 'signatures': signatures}, f)
+        os.replace(tmp_path, index_path)
+        return cls(directory, ids, transform, shape, signatures)
+
+    def matches(self, ids: Sequence[str], transform: Affine, shape: Tuple[int, int],
+                signatures: Dict[str, list]) -> bool:
+        return (list(ids) == self.ids and tuple(shape) == self.shape
+                and self.transform.almost_equals(transform) and signatures == self.signatures)
+
+    def __getstate__(self):
+        """跨进程传递时只传目录和索引，接收方重新映射同一文件，不复制数组"""
+        return {'directory': self.directory, 'ids': self.ids, 'transform': list(self.transform)[:6],
+                'shape': self.shape, 'signatures': self.signatures}
+
+    def __setstate__(self, state):
+        self.__init__(state['directory'], state['ids'], Affine(*state['transform']), state['shape'],
+                      state['signatures'])
+
+    def close(self):
+        self.cube = None
+        self.valid = None
+
+    # ---------- 切片 ----------
+    def __contains__(self, scene_id):
+        return scene_id in self.index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scene(self, scene_id: str) -> np.ndarray:
+        """(波段, y, x) 只读视图"""
+        return self.cube[self.index[scene_id]]
+
+    def valid_mask(self, scene_id: str) -> np.ndarray:
+        """(y, x) 只读视图"""
+        return self.valid[self.index[scene_id]]
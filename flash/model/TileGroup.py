@@ -2,6 +2,8 @@
 # @Author : ZXQ
 # @Time : 2025/9/11 19:39
 class TileGroup:
+    __slots__ = ('tile', 'id')
+
     def __init__(self, tile=None, id=None):
         self.tile = tile
         self.id = id
@@ -1,15 +1,41 @@
 # -*- coding: utf-8 -*-            
 # @Author : ZXQ
 # @Time : 2025/9/11 7:59
+import hashlib
+
 import geopandas as gpd
+from shapely.ops import unary_union
+
+# ROI 提交 GEE 前的简化容差（度），约 10 m
+DEFAULT_SIMPLIFY_TOLERANCE = 0.0001
+
 
 class VectorFile:
-    def __init__(self, file_path):
+    def __init__(self, file_path, simplify_tolerance=DEFAULT_SIMPLIFY_TOLERANCE):
         self.file_path = file_path
+        self.simplify_tolerance = simplify_tolerance
         self.gdf = self.__load_vector_from_file(file_path)
+        self._content_hash = None
 
     def __load_vector_from_file(self, file_path):
         gdf = gpd.read_file(file_path)
         return gdf
     def geometry(self):
-        return self.gdf.geometry
\ No newline at end of file
+        return self.gdf.geometry
+
+    def wgs84_gdf(self):
+        """转换到 WGS84 的要素表（本身是 WGS84 或无坐标系时原样返回）"""
+        gdf = self.gdf
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs(epsg=4326)
+        return gdf
+
+    def union_geometry(self):
+        """所有要素合并为一个 WGS84 几何"""
+        return unary_union(self.wgs84_gdf().geometry.values)
+
+    def content_hash(self) -> str:
+        """按几何内容（WGS84 下合并后的 WKB）计算的哈希，与文件路径、要素顺序无关；只计算一次"""
+        if self._content_hash is None:
+            self._content_hash = hashlib.md5(self.union_geometry().wkb).hexdigest()
+        return self._content_hash
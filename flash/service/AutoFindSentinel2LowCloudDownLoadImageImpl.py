@@ -4,8 +4,7 @@
 import itertools
 import os
 from typing import List, Dict, Tuple, Iterator
-from itertools import combinations, product, groupby
-from operator import attrgetter
+from itertools import combinations, product
 import concurrent.futures
 from threading import Lock
 import time
@@ -14,22 +13,37 @@ import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import ee
 import geemap
-from PySide6.QtCore import QMutex, Slot, Signal
+from PySide6.QtCore import QMutex, Slot, Signal, Qt
 from geemap import get_image_thumbnail, get_bounds
 from matplotlib.image import thumbnail
 
 from flash.common.QtExecutor import QtExecutor
 from flash.common.TaskThread import TaskThread
 from flash.model.DataPathConfig import DataPathConfig
+from flash.model.MosaicResultStore import MosaicResultStore
 from flash.model.RemoteSensingImage import RemoteSensingImage
+from flash.model.SceneMaskTable import MASK_SOURCE_THUMBNAIL, MASK_SOURCE_SERVER
 from flash.model.Sentinel2DataSourceConfigure import Sentinel2DataSourceConfigure
 from flash.model.Sentinel2Image import Sentinel2Image
-from flash.model.Sentinel2TileItem import Sentinel2TileItem
+from flash.model.SceneTable import group_tile_items
 from flash.model.ThreadOperateStatus import ThreadOperateStatus
+from flash.model.ThumbnailCache import ThumbnailCache
+from flash.model.ThumbnailDatacube import ThumbnailDatacube
 from flash.model.VectorFile import VectorFile
 from flash.service.FindLowCloudService import FindLowCloud
-from flash.util.GEEScriptFunUtil import is_img_cover_roi_ret_area, calculate_pixel_coverage
-from flash.util.S2_Util import png_to_geotiff_with_rasterio, create_mosaic_with_gdal
+from flash.service.GdalMosaicCompositorImpl import GdalMosaicCompositorImpl
+from flash.service.InMemoryMosaicCompositorImpl import InMemoryMosaicCompositorImpl
+from flash.service.MosaicCompositor import MosaicCompositor, MOSAIC_ENGINE_GDAL, MOSAIC_ENGINE_MEMORY
+from flash.service.MosaicExecutor import MosaicExecutor
+from flash.service.MosaicSearchEngine import MosaicSearchEngine
+from flash.service.SetCoverMosaicSearchEngineImpl import SetCoverMosaicSearchEngineImpl
+from flash.service.SqliteSceneCatalogServiceImpl import SqliteSceneCatalogServiceImpl
+from flash.util.vector_util import prepare_roi
+from flash.util.GEEScriptFunUtil import is_img_cover_roi_ret_area, calculate_pixel_coverage, add_quality_band, \
+    QUALITY_BAND, batch_clipped_bounds, compute_visualized_pixels
+from flash.util.S2_Util import png_to_geotiff_with_rasterio, pixel_grid_for_bounds, array_to_geotiff, snapped_pixel_grid, \
+    roi_grid_mask, crop_geotiff_to_grid
+from flash.util.coverage_util import FOOTPRINT_PROPERTY, footprint_to_polygon
 
 
 class MosaicCoverResult:
@@ -64,6 +78,15 @@ def create_mosaic_cover_object(result_dict):
     return MosaicCoverResult(result_dict)
 
 
+RGB_VIS_PARAMS = {'bands': ['B4', 'B3', 'B2'], 'min': 0, 'max': 3000}
+## 缩略图获取方式：pixels（computePixels 直接取数组写 tif）/ png（下载 PNG 再转 tif）
+THUMBNAIL_FETCH_PIXELS = 'pixels'
+THUMBNAIL_FETCH_PNG = 'png'
+
+THUMBNAIL_EXTENT_ROI = 'roi'
+THUMBNAIL_EXTENT_SCENE = 'scene'
+
+
 class AutoFindSentinel2LowCloudDownLoadImageImpl(FindLowCloud):
     emit_thumbnail_url = Signal(list)
     emit_progress = Signal(dict)
@@ -77,7 +100,35 @@ class AutoFindSentinel2LowCloudDownLoadImageImpl(FindLowCloud):
         self.batch_size = self.sentinel2_data_source_configure.batch_size
         self.roi = self.sentinel2_data_source_configure.roi
         self.data_path_config = sentinel2_data_source_configure.data_path_config
-        self.receive_thead_operate_status.connect(self.on_thread_operate_status)  ## 接收线程操作状态信号
+        ## 本地影像目录，同时缓存缩略图边界坐标；未启用时只在内存中缓存
+        self.scene_catalog = None
+        if sentinel2_data_source_configure.use_scene_catalog and self.data_path_config.base_path:
+            self.scene_catalog = SqliteSceneCatalogServiceImpl(self.data_path_config.catalog_path)
+        self.footprint_cache: Dict[str, list] = {}
+        ## 内容寻址的缩略图缓存，所有 ROI 共用，按磁盘预算 LRU 淘汰
+        self.thumbnail_cache = ThumbnailCache(self.data_path_config.thumbnail_cache_path,
+                                              int(sentinel2_data_source_configure.thumbnail_cache_max_mb * 1024 * 1024))
+        ## scene 范围：整景缩略图共享缓存 + 本地按 ROI 掩码裁剪；roi_grid 为 ROI 在统一格网上的 (仿射变换, 掩码)
+        self.scene_extent_thumbnails = sentinel2_data_source_configure.thumbnail_extent == THUMBNAIL_EXTENT_SCENE
+        self.roi_grid = None
+        ## 缩略图数据立方体：全部缩略图就绪后一次性对齐到公共网格，供覆盖掩码和镶嵌共用
+        self.datacube = None
+        ## 镶嵌组合搜索引擎，可替换为其他 MosaicSearchEngine 实现
+        self.search_engine: MosaicSearchEngine = SetCoverMosaicSearchEngineImpl(
+            self.roi,
+            mode=sentinel2_data_source_configure.search_mode,
+            grid_size=sentinel2_data_source_configure.coverage_grid_size,
+            combination_cost=sentinel2_data_source_configure.combination_cost(),
+            unit=sentinel2_data_source_configure.search_unit,
+            max_date_spread_days=sentinel2_data_source_configure.max_date_spread_days)
+        ## 镶嵌合成器，可替换为其他 MosaicCompositor 实现
+        self.mosaic_compositor: MosaicCompositor = self.create_mosaic_compositor()
+        ## 已生成镶嵌结果的索引，命中的组合直接交付
+        self.mosaic_results = None
+        if sentinel2_data_source_configure.use_mosaic_result_cache:
+            self.mosaic_results = MosaicResultStore(self.data_path_config.mosaic_result_store_path)
+        ## 接收线程操作状态信号；本对象在工作线程 run() 中创建，该线程没有事件循环，必须直接调用
+        self.receive_thead_operate_status.connect(self.on_thread_operate_status, Qt.ConnectionType.DirectConnection)
 
     def filter(self, image: RemoteSensingImage):
         image: Sentinel2Image
@@ -88,25 +139,15 @@ class AutoFindSentinel2LowCloudDownLoadImageImpl(FindLowCloud):
         self.thread_operate_status = thread_operate_status
 
     def find(self):
-        # 必须先按 MGRS_TILE 排序
-        sorted_list = sorted(self.remote_sensing_image, key=attrgetter('MGRS_TILE'))
-        tile_dict = {}
-
-        for key, g in groupby(sorted_list, key=attrgetter('MGRS_TILE')):
-            items = list(g)
-            tile_dict[key] = [
-                Sentinel2TileItem(
-                    tile=key,
-                    id=item.id,
-                    start_date=item.system_time_start,
-                    end_date=item.system_time_end,
-                    sentinel2Image=item
-                )
-                for item in items
-            ]
+        # 按 MGRS_TILE 分组（行视图直接在列式表上排序，其他影像对象按属性排序）
+        tile_dict = group_tile_items(self.remote_sensing_image)
 
         # 2. 逐步增加tile数量进行组合镶嵌 - 并发优化版本
+        self.search_budget = self.sentinel2_data_source_configure.search_budget()
+        self.search_budget.start()
+        self.best_results = []
         self.try_multi_tile_mosaic_adaptive(tile_dict)
+        return self.best_results
 
     def generate_combinations(self, data_dict):
         """
@@ -191,31 +232,160 @@ class AutoFindSentinel2LowCloudDownLoadImageImpl(FindLowCloud):
     # 自适应并发版本
     def try_multi_tile_mosaic_adaptive(self, tile_dict):
         """自适应并发版本"""
-        total_tile =  len(tile_dict)
-
-        for tile_id, images in tile_dict.items():
-            ## 获取RGB缩略图url和边界点
-            thumbnail_coordinates = self.get_image_thumbnail_coordinates(tile_id, images)
-            ## 缩略图写入边界点转tif
-            self.thumbnail_to_tif_with_crs(tile_id, thumbnail_coordinates)
-        ### 所有tile的tif准备好了
-        ### 生成组合方案
-        all_combinations = self.generate_combinations(tile_dict)
+        ## 并发获取RGB缩略图和边界点，每完成一景立即写入边界点转tif，并放入缩略图缓存
+        try:
+            for tile_id, thumbnail_coordinate in self.iter_thumbnail_coordinates(tile_dict):
+                self.thumbnail_to_tif_with_crs(tile_id, [thumbnail_coordinate])
+                if not self.scene_extent_thumbnails:
+                    self.thumbnail_cache.put(self.thumbnail_cache_key(thumbnail_coordinate['id']),
+                                             self.thumbnail_tif_path(tile_id, thumbnail_coordinate['id']))
+            self.thumbnail_cache.save()
+            print(f"缩略图缓存命中率：{self.thumbnail_cache.hit_rate:.1%}")
+            if self.thread_operate_status.is_stopped:
+                return
+            self.mosaic_thumbnails(tile_dict)
+        finally:
+            ## 工作 tif 与缓存条目是同一份数据（或可由缓存重新裁剪），用完即删，ROI 目录不随运行次数增长
+            self.remove_thumbnail_tifs(tile_dict)
+
+    def mosaic_thumbnails(self, tile_dict):
+        """工作 tif 就绪后建立数据立方体、搜索组合并按代价顺序镶嵌"""
+        total_tile = len(tile_dict)
+        ### 所有tile的tif准备好了，一次性重采样入库到数据立方体，再按配置准备本地覆盖掩码
+        self.datacube = self.build_thumbnail_datacube(tile_dict)
+        self.prepare_coverage_masks(tile_dict)
+        self.mosaic_compositor.prepare(tile_dict, self.datacube)
+        ### 生成组合方案：集合覆盖搜索，只产生能覆盖 ROI 的极小组合，按组合代价升序
+        all_combinations = self.search_engine.search_with_cost(tile_dict, self.search_budget)
         self.emit_progress.emit({'max_tile_num': total_tile, 'current_mosaic_num': 0})
         # self.total_combination_num = len(all_combinations)
         self.total_combination_num = total_tile
         self.current_image_num = 0
-        ### 创建批量计算
-        for combination in all_combinations:
+        ### 创建批量计算：组合按代价升序并发镶嵌，结果按提交顺序交付，任意时刻停止得到的都是目前最优的结果
+        configure = self.sentinel2_data_source_configure
+        executor = MosaicExecutor(self.mosaic_compositor, configure.mosaic_workers, configure.mosaic_pool)
+        executor.run(self.mosaic_jobs(all_combinations), self.deliver_mosaic,
+                     self.lookup_mosaic if self.mosaic_results is not None else None)
+        if self.mosaic_results is not None:
+            print(f"镶嵌结果缓存：{self.mosaic_results.stats()}")
+
+    def mosaic_jobs(self, all_combinations):
+        """按需产出待镶嵌的组合：预算用尽或停止时结束，暂停时等待（已提交的任务继续执行）"""
+        for cost, combination in all_combinations:
+            stop_reason = self.search_budget.stop_reason(len(self.best_results), cost)
+            if stop_reason:
+                print(f"提前终止搜索：{stop_reason}")
+                return
             while self.thread_operate_status.is_paused:
                 time.sleep(0.5)
             if self.thread_operate_status.is_stopped:
-                break
+                return
             if self.thread_operate_status.is_running:
-                create_mosaic_with_gdal(combination, self.data_path_config.roi_path,
-                                        self.write_thumbnail_to_file_callback,
-                                        self.data_path_config.gdal_bin_path,
-                                        self.sentinel2_data_source_configure.batch_size)
+                yield cost, combination
+        if self.search_budget.is_expired():
+            # 搜索引擎在枚举过程中到达时限，没有再产出组合
+            print(f"提前终止搜索：{self.search_budget.stop_reason(len(self.best_results))}")
+
+    def deliver_mosaic(self, cost, combination, outputs) -> bool:
+        """在本线程按代价顺序交付一个镶嵌结果并发出界面信号，返回是否继续"""
+        if self.thread_operate_status.is_stopped or self.search_budget.is_quota_reached(len(self.best_results)):
+            return False
+        if outputs:
+            self.write_thumbnail_to_file_callback(outputs)
+            self.best_results.append({'cost': cost, 'item_ids': [item.id for item in combination]})
+            if self.mosaic_results is not None:
+                ## 交付即落盘，之后停止或崩溃都不会丢失已完成的组合
+                self.mosaic_results.put(self.mosaic_result_key(combination), outputs[0]['item_ids'], outputs,
+                                        cost=cost, coverage=self.combination_coverage(combination),
+                                        cloud=self.combination_cloud(combination))
+        return True
+
+    def lookup_mosaic(self, combination):
+        return self.mosaic_results.get(self.mosaic_result_key(combination))
+
+    def mosaic_result_key(self, combination) -> str:
+        """
+        规范化的影像组合 + 影响输出的参数：quality 合成与顺序无关，按 id 排序；mosaic 合成后者覆盖前者，保留顺序。
+        镶嵌引擎（输出范围不同）和是否写 GeoTIFF（输出文件集合不同）也计入键。
+        """
+        configure = self.sentinel2_data_source_configure
+        scene_ids = [item.id for item in combination]
+        quality = None
+        if configure.composite_mode == 'quality':
+            scene_ids = sorted(scene_ids)
+            quality = configure.quality_source
+        return ThumbnailCache.key_for(scenes=scene_ids, composite_mode=configure.composite_mode, quality=quality,
+                                      vis_params=RGB_VIS_PARAMS, dimensions=configure.batch_size,
+                                      roi=prepare_roi(self.roi).cache_key, extent=configure.thumbnail_extent,
+                                      resolution=configure.scene_thumbnail_resolution,
+                                      fetch_mode=configure.thumbnail_fetch_mode, engine=configure.mosaic_engine,
+                                      geotiff=configure.mosaic_write_geotiff)
+
+    def combination_coverage(self, combination):
+        """组合在 ROI 网格点上的覆盖比例，掩码未计算时为 None"""
+        mask_table = self.search_engine.mask_table
+        scene_ids = [item.id for item in combination]
+        if not all(scene_id in mask_table for scene_id in scene_ids):
+            return None
+        return float(mask_table.coverage_ratio(mask_table.rows_for([scene_ids]))[0])
+
+    @staticmethod
+    def combination_cloud(combination):
+        """组合内影像云量的平均值"""
+        clouds = [item.sentinel2Image.CLOUDY_PIXEL_PERCENTAGE for item in combination
+                  if item.sentinel2Image is not None and item.sentinel2Image.CLOUDY_PIXEL_PERCENTAGE is not None]
+        return sum(clouds) / len(clouds) if clouds else None
+
+    def build_thumbnail_datacube(self, tile_dict):
+        """镶嵌或覆盖掩码要用到缩略图时构建（影像和缩略图都未变化时直接打开已有的）"""
+        configure = self.sentinel2_data_source_configure
+        if configure.mosaic_engine != MOSAIC_ENGINE_MEMORY and configure.coverage_mask_source != MASK_SOURCE_THUMBNAIL:
+            return None
+        scenes = [(image.id, self.thumbnail_tif_path(tile_id, image.id))
+                  for tile_id, images in tile_dict.items() for image in images]
+        try:
+            return ThumbnailDatacube.for_scenes(os.path.join(self.data_path_config.roi_path, 'datacube'), scenes)
+        except Exception as e:
+            print(f"构建缩略图数据立方体失败: {e}")
+            return None
+
+    def prepare_coverage_masks(self, tile_dict):
+        """按配置的来源写入每景影像的有效掩码，未写入的影像由搜索引擎按足迹计算"""
+        mask_source = self.sentinel2_data_source_configure.coverage_mask_source
+        mask_table = self.search_engine.mask_table
+        if mask_source == MASK_SOURCE_THUMBNAIL and self.datacube is not None:
+            ## 直接在数据立方体的有效掩码平面上采样，不再逐景打开 tif
+            for scene_id in self.datacube.ids:
+                mask_table.add_valid_mask(scene_id, self.datacube.valid_mask(scene_id), self.datacube.transform)
+        elif mask_source == MASK_SOURCE_THUMBNAIL:
+            for tile_id, images in tile_dict.items():
+                for image in images:
+                    tif_path = os.path.join(self.data_path_config.roi_path, tile_id,
+                                            f'{image.id}_{self.sentinel2_data_source_configure.batch_size}.tif')
+                    if os.path.exists(tif_path):
+                        mask_table.add_thumbnail_alpha(image.id, tif_path)
+        elif mask_source == MASK_SOURCE_SERVER:
+            try:
+                failed = mask_table.add_from_server([image.id for images in tile_dict.values() for image in images])
+            except Exception as e:
+                print(f"服务器批量计算覆盖掩码失败，改用足迹: {e}")
+                return
+            failed_ids = set(failed)
+            for images in tile_dict.values():
+                for image in images:
+                    if image.id in failed_ids:
+                        mask_table.add_footprint(image.id, image.sentinel2Image.properties.get(FOOTPRINT_PROPERTY))
+            if failed:
+                print(f"{len(failed)} 景影像服务器采样结果不完整，改用足迹: {failed[:5]}")
+
+    def create_mosaic_compositor(self) -> MosaicCompositor:
+        configure = self.sentinel2_data_source_configure
+        if configure.mosaic_engine == MOSAIC_ENGINE_GDAL:
+            return GdalMosaicCompositorImpl(self.data_path_config.roi_path, configure.batch_size,
+                                            self.data_path_config.gdal_bin_path, configure.composite_mode)
+        return InMemoryMosaicCompositorImpl(self.data_path_config.roi_path, configure.batch_size,
+                                            configure.composite_mode, configure.mosaic_write_geotiff,
+                                            int(configure.mosaic_prefix_cache_mb * 1024 * 1024))
 
     def thumbnail_to_tif_with_crs(self, tile_id, thumbnail_coordinates):
         """
@@ -224,13 +394,19 @@ class AutoFindSentinel2LowCloudDownLoadImageImpl(FindLowCloud):
         :return:
         """
         for thumbnail_coordinate in thumbnail_coordinates:
+            if thumbnail_coordinate.get('tif_ready'):
+                ## 直接取像素时已写好 tif
+                continue
             id = thumbnail_coordinate['id']
             png_path = os.path.join(self.data_path_config.roi_path,
                                     tile_id, f'{id}_{self.sentinel2_data_source_configure.batch_size}.png')
             tif_path = os.path.join(self.data_path_config.roi_path,
                                     tile_id, f'{id}_{self.sentinel2_data_source_configure.batch_size}.tif')
-            png_to_geotiff_with_rasterio(png_path, thumbnail_coordinate['footprint'], tif_path)
+            quality_png_path = thumbnail_coordinate.get('quality_png_path')
+            png_to_geotiff_with_rasterio(png_path, thumbnail_coordinate['footprint'], tif_path, quality_png_path)
             os.remove(png_path)
+            if quality_png_path and os.path.exists(quality_png_path):
+                os.remove(quality_png_path)
         pass
 
     def _sort_tiles_by_priority(self, tile_dict):
@@ -273,36 +449,215 @@ class AutoFindSentinel2LowCloudDownLoadImageImpl(FindLowCloud):
 
     def get_image_thumbnail_coordinates(self, tile_id, images):
         """获取影像的缩略图URL和边界坐标"""
-        os.makedirs(os.path.join(self.data_path_config.roi_path, tile_id), exist_ok=True)
-        thumbnail_coordinates = []
-        for image in images:
-            try:
-                ## 存在则跳过
+        return [thumbnail_coordinate
+                for _, thumbnail_coordinate in self.iter_thumbnail_coordinates({tile_id: images})]
 
-                if (os.path.exists(os.path.join(self.data_path_config.roi_path, tile_id,
-                                                f'{image.id}_{self.sentinel2_data_source_configure.batch_size}.png')) or
-                        os.path.exists(
-                            os.path.join(self.data_path_config.roi_path, tile_id,
-                                         f'{image.id}_{self.sentinel2_data_source_configure.batch_size}.tif'))):
+    def iter_thumbnail_coordinates(self, tile_dict) -> Iterator[Tuple[str, dict]]:
+        """
+        有界线程池并发获取所有 tile 的缩略图和边界坐标，按完成顺序产出 (tile_id, thumbnail_coordinate)，
+        调用方拿到一景就可以立即转 tif，不必等待整个 tile。缓存命中的缩略图跳过，失败的影像只打印不产出。
+        """
+        batch_size = self.sentinel2_data_source_configure.batch_size
+        ## ROI 只准备一次，所有缩略图请求共用同一个简化后的几何
+        roi = prepare_roi(self.roi).ee_geometry
+        pending = []
+        for tile_id, images in tile_dict.items():
+            os.makedirs(os.path.join(self.data_path_config.roi_path, tile_id), exist_ok=True)
+            for image in images:
+                ## 缓存命中（影像、可视化参数、尺寸、ROI 都相同）时链接到工作目录，跳过下载；
+                ## scene 范围时缓存的是整景缩略图，在线程池中本地裁剪
+                tif_path = self.thumbnail_tif_path(tile_id, image.id)
+                if not self.scene_extent_thumbnails and self.thumbnail_cache.get(self.thumbnail_cache_key(image.id),
+                                                                                 tif_path):
                     continue
-                roi = geemap.geopandas_to_ee(self.roi.gdf)
-                ee_image = ee.Image(image.id).clip(roi)
-                id = image.id
-                file_name = f'{id}_{self.sentinel2_data_source_configure.batch_size}.png'
-                get_image_thumbnail(ee_image,
-                                    out_img=os.path.join(self.data_path_config.roi_path, tile_id, file_name),
-                                    vis_params={
-                                        'bands': ['B4', 'B3', 'B2'],
-                                        'min': 0,
-                                        'max': 3000
-                                    },
-                                    dimensions=self.sentinel2_data_source_configure.batch_size,
-                                    format='png', crs='epsg:4326')
-                footprint = ee_image.geometry().bounds().coordinates().get(0).getInfo()
-                thumbnail_coordinates.append({'id': image.id, 'footprint': footprint})
-
+                ## 缓存未命中（被淘汰或上次异常退出）但工作目录已有 tif 时直接复用，并补进缓存
+                if os.path.exists(tif_path):
+                    if not self.scene_extent_thumbnails:
+                        self.thumbnail_cache.put(self.thumbnail_cache_key(image.id), tif_path)
+                    continue
+                pending.append((tile_id, image))
+        print(f"缩略图缓存：{self.thumbnail_cache.stats()}")
+        if not pending:
+            return
+
+        if self.scene_extent_thumbnails:
+            ## 整景范围直接取元数据足迹，ROI 的窗口和栅格化掩码只计算一次，所有影像共用
+            footprints = self.resolve_scene_footprints(pending)
+            self.roi_grid = roi_grid_mask(prepare_roi(self.roi).geometry,
+                                          self.sentinel2_data_source_configure.scene_thumbnail_resolution)
+        else:
+            ## 边界坐标一次批量解析，线程池中只剩缩略图下载
+            footprints = self.resolve_thumbnail_footprints([image.id for _, image in pending])
+        ## 裁剪后为空的影像与 ROI 不相交，不再下载
+        pending = [(tile_id, image) for tile_id, image in pending
+                   if not (image.id in footprints and footprints[image.id] is None)]
+        self.emit_progress.emit({'max_tile_num': len(pending), 'current_mosaic_num': 0})
+        executor = ThreadPoolExecutor(max_workers=self.sentinel2_data_source_configure.thumbnail_workers)
+        try:
+            futures = {executor.submit(self._fetch_thumbnail, tile_id, image, roi, footprints.get(image.id)):
+                           (tile_id, image)
+                       for tile_id, image in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                tile_id, image = futures[future]
+                self.emit_progress.emit({'max_tile_num': len(pending), 'current_mosaic_num': done})
+                try:
+                    thumbnail_coordinate = future.result()
+                except Exception as e:
+                    print(f"获取影像 {image.id} 缩略图或边界失败: {e}")
+                    continue
+                yield tile_id, thumbnail_coordinate
+                while self.thread_operate_status.is_paused:
+                    time.sleep(0.5)
+                if self.thread_operate_status.is_stopped:
+                    break
+        finally:
+            ## 停止或调用方提前结束时取消尚未开始的请求
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def remove_thumbnail_tifs(self, tile_dict):
+        for tile_id, images in tile_dict.items():
+            for image in images:
+                tif_path = self.thumbnail_tif_path(tile_id, image.id)
+                if os.path.exists(tif_path):
+                    try:
+                        os.remove(tif_path)
+                    except OSError as e:
+                        print(f"删除缩略图工作文件 {tif_path} 失败: {e}")
+
+    def thumbnail_tif_path(self, tile_id, id) -> str:
+        return os.path.join(self.data_path_config.roi_path, tile_id,
+                            f'{id}_{self.sentinel2_data_source_configure.batch_size}.tif')
+
+    def thumbnail_cache_key(self, id) -> str:
+        """缩略图内容由这些参数唯一确定，任一变化都视为不同的缩略图"""
+        configure = self.sentinel2_data_source_configure
+        quality = configure.quality_source if configure.composite_mode == 'quality' else None
+        return ThumbnailCache.key_for(id=id, vis_params=RGB_VIS_PARAMS, quality=quality,
+                                      dimensions=configure.batch_size, roi=prepare_roi(self.roi).cache_key,
+                                      crs='EPSG:4326', fetch_mode=configure.thumbnail_fetch_mode)
+
+    def scene_thumbnail_cache_key(self, id) -> str:
+        """整景缩略图与 ROI 无关，键中不含 ROI，不同 ROI 命中同一条目"""
+        configure = self.sentinel2_data_source_configure
+        quality = configure.quality_source if configure.composite_mode == 'quality' else None
+        return ThumbnailCache.key_for(id=id, vis_params=RGB_VIS_PARAMS, quality=quality,
+                                      resolution=configure.scene_thumbnail_resolution,
+                                      crs='EPSG:4326', extent=THUMBNAIL_EXTENT_SCENE)
+
+    def resolve_scene_footprints(self, pending) -> Dict[str, list]:
+        """由元数据足迹在本地得到整景外接矩形；与 ROI 不相交的为 None，缺少足迹的不返回（下载时单独获取）"""
+        roi_geometry = prepare_roi(self.roi).geometry
+        footprints = {}
+        for _, image in pending:
+            polygon = footprint_to_polygon(image.sentinel2Image.properties.get(FOOTPRINT_PROPERTY))
+            if polygon is None or polygon.is_empty:
+                continue
+            if not polygon.intersects(roi_geometry):
+                footprints[image.id] = None
+                continue
+            west, south, east, north = polygon.bounds
+            footprints[image.id] = [[west, south], [east, south], [east, north], [west, north], [west, south]]
+        return footprints
+
+    def resolve_thumbnail_footprints(self, image_ids, chunk_size=500) -> Dict[str, list]:
+        """
+        批量解析影像按 ROI 裁剪后的外接矩形（缩略图的地理范围）：
+        先查内存和本地目录缓存，未命中的每 chunk_size 景一次 getInfo，结果写回缓存。
+        """
+        prepared = prepare_roi(self.roi)
+        footprints = {image_id: self.footprint_cache[image_id]
+                      for image_id in image_ids if image_id in self.footprint_cache}
+        if self.scene_catalog is not None:
+            footprints.update(self.scene_catalog.get_footprints(
+                prepared.cache_key, [image_id for image_id in image_ids if image_id not in footprints]))
+        missing = [image_id for image_id in image_ids if image_id not in footprints]
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            try:
+                resolved = dict(zip(chunk, batch_clipped_bounds(chunk, prepared.ee_geometry)))
             except Exception as e:
-                print(f"获取影像 {image.id} 缩略图或边界失败: {e}")
-                image.thumbnail_url = ''
-                image.boundary_coordinates = []
-        return thumbnail_coordinates
+                ## 整批失败时由各景下载时单独获取
+                print(f"批量获取影像边界失败: {e}")
+                continue
+            footprints.update(resolved)
+            if self.scene_catalog is not None:
+                self.scene_catalog.put_footprints(prepared.cache_key, resolved)
+        self.footprint_cache.update(footprints)
+        return footprints
+
+    def _fetch_thumbnail(self, tile_id, image, roi, footprint=None) -> dict:
+        """在线程池中执行：获取一景的RGB缩略图（质量模式下加质量分），边界坐标未批量解析时单独获取"""
+        if self.scene_extent_thumbnails:
+            return self._fetch_thumbnail_scene(tile_id, image.id, footprint)
+        ee_image = ee.Image(image.id).clip(roi)
+        if footprint is None:
+            footprint = ee_image.geometry().bounds().coordinates().get(0).getInfo()
+        if self.sentinel2_data_source_configure.thumbnail_fetch_mode == THUMBNAIL_FETCH_PIXELS:
+            return self._fetch_thumbnail_pixels(tile_id, ee_image, image.id, footprint)
+
+        batch_size = self.sentinel2_data_source_configure.batch_size
+        timeout = self.sentinel2_data_source_configure.thumbnail_timeout_seconds
+        id = image.id
+        file_name = f'{id}_{batch_size}.png'
+        get_image_thumbnail(ee_image,
+                            out_img=os.path.join(self.data_path_config.roi_path, tile_id, file_name),
+                            vis_params=RGB_VIS_PARAMS,
+                            dimensions=batch_size,
+                            format='png', crs='epsg:4326', timeout=timeout)
+        thumbnail_coordinate = {'id': image.id, 'footprint': footprint}
+        if self.sentinel2_data_source_configure.composite_mode == 'quality':
+            ## 质量分缩略图与RGB缩略图范围、尺寸一致，转tif时作为最后一个波段
+            quality_png_path = os.path.join(self.data_path_config.roi_path, tile_id,
+                                            f'{id}_{batch_size}_{QUALITY_BAND}.png')
+            get_image_thumbnail(add_quality_band(ee_image, self.sentinel2_data_source_configure.quality_source),
+                                out_img=quality_png_path,
+                                vis_params={'bands': [QUALITY_BAND], 'min': 0, 'max': 255},
+                                dimensions=batch_size,
+                                format='png', crs='epsg:4326', timeout=timeout)
+            thumbnail_coordinate['quality_png_path'] = quality_png_path
+        return thumbnail_coordinate
+
+    def _fetch_thumbnail_pixels(self, tile_id, ee_image, id, footprint) -> dict:
+        """按显式网格直接取像素写 GeoTIFF，仿射变换就是取数网格本身，不经过 PNG 和临时文件"""
+        batch_size = self.sentinel2_data_source_configure.batch_size
+        grid, transform = pixel_grid_for_bounds(footprint, batch_size)
+        quality_source = None
+        if self.sentinel2_data_source_configure.composite_mode == 'quality':
+            quality_source = self.sentinel2_data_source_configure.quality_source
+        pixels = compute_visualized_pixels(ee_image, grid, RGB_VIS_PARAMS, quality_source)
+        array_to_geotiff(pixels, transform,
+                         os.path.join(self.data_path_config.roi_path, tile_id, f'{id}_{batch_size}.tif'))
+        return {'id': id, 'footprint': footprint, 'tif_ready': True}
+
+    def _fetch_thumbnail_scene(self, tile_id, id, footprint) -> dict:
+        """
+        整景缩略图按统一格网只取一次，放入与 ROI 无关的共享缓存；
+        工作 tif 由本地按 ROI 窗口裁剪并应用栅格化掩码得到，不再请求 GEE。
+        """
+        configure = self.sentinel2_data_source_configure
+        key = self.scene_thumbnail_cache_key(id)
+        transform, inside = self.roi_grid
+        tif_path = self.thumbnail_tif_path(tile_id, id)
+        ## 命中时在 checkout 内裁剪，期间其他线程的 put 不会淘汰这个缓存文件
+        with self.thumbnail_cache.checkout(key) as cached_path:
+            if cached_path is not None:
+                crop_geotiff_to_grid(cached_path, transform, inside, tif_path)
+        if cached_path is None:
+            ee_image = ee.Image(id)
+            if footprint is None:
+                footprint = ee_image.geometry().bounds().coordinates().get(0).getInfo()
+            xs, ys = zip(*footprint)
+            grid, scene_transform, _ = snapped_pixel_grid(min(xs), min(ys), max(xs), max(ys),
+                                                          configure.scene_thumbnail_resolution)
+            quality_source = configure.quality_source if configure.composite_mode == 'quality' else None
+            pixels = compute_visualized_pixels(ee_image, grid, RGB_VIS_PARAMS, quality_source)
+            scene_path = os.path.join(self.data_path_config.roi_path, tile_id, f'{id}_{THUMBNAIL_EXTENT_SCENE}.tif')
+            array_to_geotiff(pixels, scene_transform, scene_path)
+            crop_geotiff_to_grid(scene_path, transform, inside, tif_path)
+            self.thumbnail_cache.put(key, scene_path)
+            os.remove(scene_path)
+        height, width = inside.shape
+        west, north = transform.c, transform.f
+        east, south = west + width * transform.a, north + height * transform.e
+        return {'id': id, 'footprint': [[west, south], [east, south], [east, north], [west, north], [west, south]],
+                'tif_ready': True}
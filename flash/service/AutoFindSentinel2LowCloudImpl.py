@@ -2,7 +2,7 @@
 # @Author : ZXQ
 # @Time : 2025/9/11 9:35
 from typing import List, Dict, Tuple, Iterator
-from itertools import combinations, product, groupby
+from itertools import combinations, product, groupby, islice
 from operator import attrgetter
 import concurrent.futures
 from threading import Lock
@@ -17,12 +17,21 @@ from matplotlib.image import thumbnail
 
 from flash.common.QtExecutor import QtExecutor
 from flash.common.TaskThread import TaskThread
+from flash.model.CombinationCost import CombinationCost
+from flash.model.FootprintIndex import FootprintIndex
 from flash.model.RemoteSensingImage import RemoteSensingImage
+from flash.model.SceneMaskTable import SceneMaskTable
 from flash.model.Sentinel2Image import Sentinel2Image
+from flash.model.SceneTable import group_tile_items
 from flash.model.Sentinel2TileItem import Sentinel2TileItem
 from flash.model.VectorFile import VectorFile
 from flash.service.FindLowCloudService import FindLowCloud
-from flash.util.GEEScriptFunUtil import is_img_cover_roi_ret_area, calculate_pixel_coverage
+from flash.util.vector_util import prepare_roi
+from flash.util.GEEScriptFunUtil import is_img_cover_roi_ret_area, calculate_pixel_coverage, quality_mosaic, \
+    QUALITY_SOURCE_SCL
+from flash.util.best_first_util import merge_by_cost, size_lower_bounds
+from flash.util.coverage_util import FOOTPRINT_PROPERTY
+from flash.util.temporal_util import TemporalWindowIndex, windowed_best_first_product, windowed_product
 
 
 class MosaicCoverResult:
@@ -62,45 +71,59 @@ class AutoFindSentinel2LowCloudImpl(FindLowCloud):
     emit_progress = Signal(dict)
 
     def __init__(self, sentinel2_image: List[Sentinel2Image], roi: VectorFile,
-                 batch_size=40):
+                 batch_size=40, combination_cost: CombinationCost = None,
+                 composite_mode='mosaic', quality_source=QUALITY_SOURCE_SCL, ranked_order=True,
+                 ranked_limit=1000, coverage_grid_size=64, min_intersection_ratio=0.001, max_date_spread_days=None):
         super().__init__(sentinel2_image)
         self.roi = roi
         self.low_cld_coverage_images = []
         self.batch_size = batch_size
+        self.combination_cost = combination_cost or CombinationCost()
+        ## mosaic：后面的影像覆盖前面的；quality：逐像素按质量分合成，与顺序无关
+        self.composite_mode = composite_mode
+        self.quality_source = quality_source
+        ## True（默认）：前 ranked_limit 个组合按代价升序产出，之后转为字典序流式枚举（跳过已产出的组合）；
+        ##   最优优先的前沿和去重集合都只随前 ranked_limit 个组合增长，内存有上界；None 表示不限制（内存随输出增长）
+        ## False：全部按字典序流式枚举，内存恒定
+        self.ranked_order = ranked_order
+        self.ranked_limit = ranked_limit
+        self.coverage_grid_size = coverage_grid_size
+        self.mask_table = None
+        ## 足迹空间索引：剔除与 ROI 相交可忽略的影像，精确拒绝覆盖不全的组合
+        self.min_intersection_ratio = min_intersection_ratio
+        self.footprint_index = None
+        ## 组合内影像的最大时间跨度（天），None 表示不限制
+        self.max_date_spread_days = max_date_spread_days
 
     def filter(self, image: RemoteSensingImage):
         image: Sentinel2Image
         return super().filter(image)
 
     def find(self):
-        # 必须先按 MGRS_TILE 排序
-        sorted_list = sorted(self.remote_sensing_image, key=attrgetter('MGRS_TILE'))
-        tile_dict = {}
-
-        for key, g in groupby(sorted_list, key=attrgetter('MGRS_TILE')):
-            items = list(g)
-            tile_dict[key] = [
-                Sentinel2TileItem(
-                    tile=key,
-                    id=item.id,
-                    start_date=item.system_time_start,
-                    end_date=item.system_time_end,
-                    sentinel2Image=item
-                )
-                for item in items
-            ]
+        # 先剔除与 ROI 相交可忽略的影像
+        self.footprint_index = FootprintIndex(self.remote_sensing_image, self.roi, self.min_intersection_ratio)
+        relevant_images = self.footprint_index.relevant_images(self.remote_sensing_image)
+        print(f"足迹预筛：{len(self.remote_sensing_image)} 景中 {len(relevant_images)} 景与 ROI 有效相交")
+
+        # 按 MGRS_TILE 分组（行视图直接在列式表上排序，其他影像对象按属性排序）
+        tile_dict = group_tile_items(relevant_images)
 
         # 2. 逐步增加tile数量进行组合镶嵌 - 并发优化版本
         self.try_multi_tile_mosaic_adaptive(tile_dict)
 
     # 自适应并发版本
     def try_multi_tile_mosaic_adaptive(self, tile_dict):
-        """自适应并发版本"""
-        combinations = self._get_all_combinations(tile_dict)
-        self.emit_progress.emit({'max': len(combinations), 'current': 0})
-        pre_num =  0
-        for i in range(0, len(combinations), self.batch_size):
-            batch_combinations = combinations[i:i + self.batch_size]
+        """自适应并发版本：组合流式生成、分块提交，内存占用与组合总数无关"""
+        total = self._count_all_combinations(tile_dict)
+        self.emit_progress.emit({'max': total, 'current': 0})
+        pre_num = 0
+        for batch_combinations in self._iter_batches(self._iter_all_combinations(tile_dict), self.batch_size):
+            pre_num += len(batch_combinations)
+            ## 本地预筛（位集 + 足迹并集）：几何上覆盖不了 ROI 的组合不再提交 GEE
+            batch_combinations = self._screen_by_coverage(batch_combinations)
+            if not batch_combinations:
+                self.emit_progress.emit({'max': total, 'current': pre_num})
+                continue
             ee_results = self._create_ee_batch_computation(batch_combinations)
             results = ee_results.getInfo()
             covereds = list(filter(lambda x: x['is_covered'], results))
@@ -109,16 +132,39 @@ class AutoFindSentinel2LowCloudImpl(FindLowCloud):
             covered_ids = [covered['id'] for covered in covereds]
             filtered_combinations = [batch_combinations[i] for i in covered_ids if i < len(batch_combinations)]
 
-            for i in range(0, len(filtered_combinations), self.batch_size):
-                batch_combinations = filtered_combinations[i:i + self.batch_size]
-                thumbnail_urls = self.get_thumbnail_urls_for_covered_results(batch_combinations).getInfo()
-                pre_num += len(thumbnail_urls)
-                self.emit_progress.emit({'max': len(combinations), 'current': pre_num})
+            for covered_batch in self._iter_batches(filtered_combinations, self.batch_size):
+                thumbnail_urls = self.get_thumbnail_urls_for_covered_results(covered_batch).getInfo()
                 self.emit_thumbnail_url.emit(thumbnail_urls)
+            self.emit_progress.emit({'max': total, 'current': pre_num})
+
+    def _screen_by_coverage(self, batch_combinations):
+        """用足迹位集向量化判断一批组合是否可能覆盖 ROI，零 GEE 调用"""
+        if self.mask_table is None:
+            self.mask_table = SceneMaskTable.from_roi(self.roi, self.coverage_grid_size)
+            for image in self.remote_sensing_image:
+                self.mask_table.add_footprint(image.id, image.properties.get(FOOTPRINT_PROPERTY))
+        rows = self.mask_table.rows_for([[item.id for item in combo['items']] for combo in batch_combinations])
+        covers = self.mask_table.covers(rows)
+        screened = [combo for combo, covered in zip(batch_combinations, covers) if covered]
+        if self.footprint_index is not None:
+            ## 位集是网格近似，再用足迹并集做精确判断
+            screened = [combo for combo in screened
+                        if self.footprint_index.covers(item.id for item in combo['items'])]
+        return screened
+
+    @staticmethod
+    def _iter_batches(iterable, batch_size):
+        """按 batch_size 分块取出，只在内存中保留当前一块"""
+        iterator = iter(iterable)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
 
     def _create_ee_batch_computation(self, all_combinations):
         """创建Earth Engine批量计算，同时获取缩略图"""
-        roi_ee = geemap.shp_to_ee(self.roi.file_path)
+        roi_ee = prepare_roi(self.roi).ee_feature_collection
 
         results_list = []
 
@@ -130,7 +176,7 @@ class AutoFindSentinel2LowCloudImpl(FindLowCloud):
                     ee_images.append(ee.Image(item.id))
 
                 # 创建镶嵌
-                clipped_mosaic = ee.ImageCollection(ee_images).mosaic().clip(roi_ee.geometry())
+                clipped_mosaic = self._composite(ee_images).clip(roi_ee.geometry())
 
                 # 使用新的覆盖率计算函数
                 coverage_info = calculate_pixel_coverage(clipped_mosaic, roi_ee)
@@ -164,7 +210,7 @@ class AutoFindSentinel2LowCloudImpl(FindLowCloud):
 
     def get_thumbnail_urls_for_covered_results(self, all_combinations):
         """只获取覆盖结果的缩略图URL"""
-        roi_ee = geemap.shp_to_ee(self.roi.file_path)
+        roi_ee = prepare_roi(self.roi).ee_feature_collection
 
         results_list = []
 
@@ -176,7 +222,7 @@ class AutoFindSentinel2LowCloudImpl(FindLowCloud):
                     ee_images.append(ee.Image(item.id))
 
                 # 创建镶嵌
-                clipped_mosaic = ee.ImageCollection(ee_images).mosaic().clip(roi_ee.geometry())
+                clipped_mosaic = self._composite(ee_images).clip(roi_ee.geometry())
 
                 # 计算覆盖率
                 coverage_info = calculate_pixel_coverage(clipped_mosaic, roi_ee)
@@ -214,25 +260,75 @@ class AutoFindSentinel2LowCloudImpl(FindLowCloud):
                 results_list.append(error_result)
 
         return ee.List(results_list)
-    def _get_all_combinations(self, tile_dict):
-        """获取所有组合"""
-        loc_combinations = []
-        sorted_tile_dict = self._sort_tiles_by_priority(tile_dict)
+    def _iter_all_combinations(self, tile_dict):
+        """惰性生成所有组合（默认代价最低的 ranked_limit 个最先送去计算，其余按 tile 数、字典序流式枚举）"""
+        ranked = self._iter_bounded_ranked_combinations(tile_dict) if self.ranked_order \
+            else self._iter_product_combinations(tile_dict)
+        for cost, items_combo in ranked:
+            yield {
+                'items': items_combo,
+                'tile_combo': tuple(item.tile for item in items_combo),
+                'tile_count': len(items_combo),
+                'cost': cost
+            }
 
-        for tile_count in range(1, len(tile_dict) + 1):
+    def _count_all_combinations(self, tile_dict):
+        """组合总数：每个 tile 选一景或不选，去掉全不选，即 ∏(1 + n_i) - 1，无需枚举"""
+        if self.max_date_spread_days is not None:
+            ## 有时间窗口时按锚点逐个窗口计数
+            return TemporalWindowIndex(list(tile_dict.values()), self.max_date_spread_days,
+                                       self._item_time).count_optional()
+        total = 1
+        for items in tile_dict.values():
+            total *= 1 + len(items)
+        return total - 1
+
+    @staticmethod
+    def _item_time(item):
+        return item.sentinel2Image.system_time_start
+
+    def _iter_product_combinations(self, tile_dict):
+        """按 tile 数由少到多、字典序惰性生成组合"""
+        sorted_tile_dict = self._sort_tiles_by_priority(tile_dict)
+        for tile_count in range(1, len(sorted_tile_dict) + 1):
             for tile_combo in combinations(sorted_tile_dict.keys(), tile_count):
-                tile_items = [sorted_tile_dict[name] for name in tile_combo]
-                limited_items = [sorted(items, key=lambda x: x.sentinel2Image.CLOUDY_PIXEL_PERCENTAGE)
-                                 for items in tile_items]
-
-                for items_combo in product(*limited_items):
-                    loc_combinations.append({
-                        'items': items_combo,
-                        'tile_combo': tile_combo,
-                        'tile_count': tile_count
-                    })
-
-        return loc_combinations
+                for items_combo in windowed_product([sorted_tile_dict[name] for name in tile_combo],
+                                                    self.max_date_spread_days, self._item_time):
+                    yield self.combination_cost.cost(items_combo), items_combo
+
+    def _iter_bounded_ranked_combinations(self, tile_dict):
+        """前 ranked_limit 个组合按代价升序，之后按字典序补齐其余组合；两段合起来与全部组合一一对应"""
+        if self.ranked_limit is None:
+            yield from self._iter_ranked_combinations(tile_dict)
+            return
+        emitted = set()
+        for cost, items_combo in islice(self._iter_ranked_combinations(tile_dict), self.ranked_limit):
+            emitted.add(self._combination_key(items_combo))
+            yield cost, items_combo
+        if len(emitted) < self.ranked_limit:
+            ## 代价序已经穷尽所有组合
+            return
+        for cost, items_combo in self._iter_product_combinations(tile_dict):
+            if self._combination_key(items_combo) not in emitted:
+                yield cost, items_combo
+
+    @staticmethod
+    def _combination_key(items_combo):
+        return frozenset(item.id for item in items_combo)
+
+    def _iter_ranked_combinations(self, tile_dict):
+        """对所有 tile 子集做最优优先枚举，并按代价惰性合并；T 个 tile 时最多合并 2^T - 1 个子集流"""
+        sorted_tile_dict = self._sort_tiles_by_priority(tile_dict)
+        tiles = list(sorted_tile_dict.keys())
+        cost = self.combination_cost
+        bounds = size_lower_bounds([min(cost.item_cost(item) for item in sorted_tile_dict[tile]) for tile in tiles])
+        streams = ((bounds[tile_count],
+                    windowed_best_first_product([sorted_tile_dict[name] for name in tile_combo],
+                                                cost.item_cost, cost.penalty, self.max_date_spread_days,
+                                                self._item_time))
+                   for tile_count in range(1, len(tiles) + 1)
+                   for tile_combo in combinations(tiles, tile_count))
+        return merge_by_cost(streams)
 
     def fined_call_back(self, url):
         """您的原始回调函数，现在在主线程中安全执行。"""
@@ -317,13 +413,14 @@ class AutoFindSentinel2LowCloudImpl(FindLowCloud):
         # 提取影像id列表
         image_ids = [item.id for item in sentinel2_images]
 
-        # 使用批量方式创建ImageCollection
-        ee_collection = ee.ImageCollection(image_ids).mosaic()
-
-        # 镶嵌成一张影像，添加质量排序
-        # mosaic_image = ee_collection.qualityMosaic('CLOUDY_PIXEL_PERCENTAGE')  # 按云量质量镶嵌
+        # 使用批量方式创建ImageCollection，按合成模式镶嵌
+        return self._composite([ee.Image(image_id) for image_id in image_ids])
 
-        return ee_collection
+    def _composite(self, ee_images):
+        """按合成模式将一组影像合成为一张"""
+        if self.composite_mode == 'quality':
+            return quality_mosaic(ee_images, self.quality_source)
+        return ee.ImageCollection(ee_images).mosaic()
 
     def mosaic_images(self, sentinel2_images):
         """
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/24 9:40
+from typing import Callable, Sequence
+
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+from flash.service.MosaicCompositor import MosaicCompositor, COMPOSITE_QUALITY
+from flash.util.S2_Util import create_mosaic_with_gdal, create_quality_mosaic_with_rasterio
+
+
+class GdalMosaicCompositorImpl(MosaicCompositor):
+    """原有实现：每个组合调用 gdalbuildvrt / gdal_translate 子进程（质量合成用 rasterio.merge 读文件）"""
+
+    def __init__(self, base_path: str, pixel_size: int, gdal_bin_path: str, composite_mode: str):
+        self.base_path = base_path
+        self.pixel_size = pixel_size
+        self.gdal_bin_path = gdal_bin_path
+        self.composite_mode = composite_mode
+
+    def composite(self, combination: Sequence[Sentinel2TileItem], write_thumbnail_to_file_callback: Callable):
+        if self.composite_mode == COMPOSITE_QUALITY:
+            ## 逐像素质量合成，与影像顺序无关
+            create_quality_mosaic_with_rasterio(combination, self.base_path, write_thumbnail_to_file_callback,
+                                                self.pixel_size)
+        else:
+            create_mosaic_with_gdal(combination, self.base_path, write_thumbnail_to_file_callback,
+                                    self.gdal_bin_path, self.pixel_size)
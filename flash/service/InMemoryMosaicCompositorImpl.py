@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/24 9:50
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from flash.model.PrefixCompositeCache import PrefixCompositeCache
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+from flash.model.ThumbnailDatacube import ThumbnailDatacube
+from flash.service.MosaicCompositor import MosaicCompositor, COMPOSITE_QUALITY
+from flash.util.S2_Util import generate_md5_filename, paint_in_order, paint_best_quality, crop_to_valid, \
+    write_mosaic_outputs
+
+
+class InMemoryMosaicCompositorImpl(MosaicCompositor):
+    """
+    进程内镶嵌：所有缩略图在 prepare() 时已对齐到公共网格并存入数据立方体（ThumbnailDatacube），
+    每个组合只是对立方体切片做 NumPy 叠加，直接从内存写 PNG 和（可选）GeoTIFF，不启动子进程、不写中间文件。
+
+    叠加规则与原实现一致：mosaic 模式后面的影像覆盖前面的，quality 模式逐像素取质量分最高者。
+    两种规则都可以逐景增量叠加，因此部分合成结果按影像序列前缀缓存（prefix_cache_bytes 为内存预算，0 不缓存），
+    新组合从最长已缓存前缀继续，只绘制不同的影像；quality 模式与顺序无关，按 id 排序以共享更多前缀。
+    """
+
+    def __init__(self, base_path: str, pixel_size: int, composite_mode: str, write_geotiff: bool = True,
+                 prefix_cache_bytes: int = 0):
+        self.base_path = base_path
+        self.pixel_size = pixel_size
+        self.composite_mode = composite_mode
+        self.write_geotiff = write_geotiff
+        self.output_dir = os.path.join(base_path, 'mosaic')
+        self.datacube: Optional[ThumbnailDatacube] = None
+        self.prefix_cache = PrefixCompositeCache(prefix_cache_bytes) if prefix_cache_bytes > 0 else None
+
+    def tif_path(self, image: Sentinel2TileItem) -> str:
+        return os.path.join(self.base_path, image.tile, image.id + f'_{self.pixel_size}.tif')
+
+    def prepare(self, tile_dict: Dict[str, List[Sentinel2TileItem]], datacube: Optional[ThumbnailDatacube] = None):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if datacube is None:
+            scenes = [(image.id, self.tif_path(image)) for images in tile_dict.values() for image in images]
+            datacube = ThumbnailDatacube.for_scenes(os.path.join(self.base_path, 'datacube'), scenes)
+        self.datacube = datacube
+        if self.prefix_cache is not None:
+            self.prefix_cache.clear()
+
+    def scene_array(self, image: Sentinel2TileItem) -> Optional[np.ndarray]:
+        """数据立方体中该景的只读视图，不在立方体中（缩略图缺失）时为 None"""
+        if image.id not in self.datacube:
+            print(f"警告：文件不存在，将跳过: {self.tif_path(image)}")
+            return None
+        return self.datacube.scene(image.id)
+
+    def composite(self, combination: Sequence[Sentinel2TileItem], write_thumbnail_to_file_callback: Callable):
+        if self.datacube is None:
+            print("错误：没有找到任何有效的影像文件进行镶嵌。")
+            return
+        ids = [os.path.basename(image.id) for image in combination]
+        if self.composite_mode == COMPOSITE_QUALITY:
+            ## 顺序无关，按 id 排序得到规范的组合标识和叠加顺序
+            item_ids = ','.join(sorted(ids))
+            combination = sorted(combination, key=lambda image: image.id)
+        else:
+            item_ids = ','.join(ids)
+        scenes = [(image.id, array) for image, array in ((image, self.scene_array(image)) for image in combination)
+                  if array is not None]
+        if not scenes:
+            print("错误：没有找到任何有效的影像文件进行镶嵌。")
+            return
+
+        mosaic, transform = crop_to_valid(self.paint(scenes), self.datacube.transform)
+        if mosaic is None:
+            print(f"组合 {item_ids} 在网格内没有有效像素，跳过")
+            return
+
+        file_name = os.path.join(self.output_dir, item_ids + '.tif').replace('\\', '/')
+        tif_path = os.path.join(self.output_dir, generate_md5_filename(file_name)).replace('\\', '/')
+        png_path = tif_path.replace('.tif', '.png')
+        try:
+            write_mosaic_outputs(mosaic, transform, png_path, tif_path if self.write_geotiff else None)
+        except Exception as e:
+            print(f"写出镶嵌结果时出错: {e}")
+            return
+        write_thumbnail_to_file_callback([{'thumbnail_url': png_path, 'item_ids': item_ids}])
+
+    def paint(self, scenes) -> np.ndarray:
+        """
+        逐景叠加 [(id, 数组)]：从最长已缓存前缀的副本开始，每多叠加一景就缓存一次新前缀（完整组合本身不缓存）。
+        """
+        paint = paint_best_quality if self.composite_mode == COMPOSITE_QUALITY else paint_in_order
+        keys = [scene_id for scene_id, _ in scenes]
+        length, cached = (0, None) if self.prefix_cache is None else self.prefix_cache.longest_prefix(keys[:-1])
+        mosaic = np.zeros(scenes[0][1].shape, dtype=scenes[0][1].dtype) if cached is None else cached.copy()
+        for depth in range(length, len(scenes)):
+            paint(mosaic, scenes[depth][1])
+            if self.prefix_cache is not None and depth < len(scenes) - 1:
+                self.prefix_cache.put(keys[:depth + 1], mosaic.copy())
+        return mosaic
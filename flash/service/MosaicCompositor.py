@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/24 9:30
+import abc
+from typing import Callable, Dict, List, Optional, Sequence
+
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+from flash.model.ThumbnailDatacube import ThumbnailDatacube
+
+COMPOSITE_MOSAIC = 'mosaic'
+COMPOSITE_QUALITY = 'quality'
+
+MOSAIC_ENGINE_MEMORY = 'memory'
+MOSAIC_ENGINE_GDAL = 'gdal'
+MOSAIC_ENGINE_LIST = [MOSAIC_ENGINE_MEMORY, MOSAIC_ENGINE_GDAL]
+
+
+class MosaicCompositor(abc.ABC):
+    """镶嵌合成器：把一组影像的缩略图 tif 合成为预览 PNG（及 GeoTIFF），完成后通过回调通知界面"""
+
+    def prepare(self, tile_dict: Dict[str, List[Sentinel2TileItem]], datacube: Optional[ThumbnailDatacube] = None):
+        """所有缩略图 tif 就绪后、开始合成前调用一次，datacube 为已入库的缩略图数据立方体；默认不做任何事"""
+        pass
+
+    @abc.abstractmethod
+    def composite(self, combination: Sequence[Sentinel2TileItem], write_thumbnail_to_file_callback: Callable):
+        """合成一组影像，成功时以 [{'thumbnail_url', 'item_ids'}] 调用回调"""
+        pass
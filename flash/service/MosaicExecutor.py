@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/25 14:30
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+from flash.service.MosaicCompositor import MosaicCompositor
+
+POOL_THREAD = 'thread'
+POOL_PROCESS = 'process'
+POOL_LIST = [POOL_THREAD, POOL_PROCESS]
+
+# 工作进程中的合成器，由进程池 initializer 设置一次
+_worker_compositor: MosaicCompositor = None
+
+
+def _init_worker(compositor: MosaicCompositor):
+    global _worker_compositor
+    _worker_compositor = compositor
+
+
+def _composite_in_worker(scene_keys: Sequence[Tuple[str, str]]) -> list:
+    """工作进程中执行：只传 (tile, id)，不传完整影像对象"""
+    outputs = []
+    _worker_compositor.composite([Sentinel2TileItem(tile, scene_id) for tile, scene_id in scene_keys],
+                                 outputs.extend)
+    return outputs
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+class MosaicExecutor:
+    """
+    并发执行镶嵌：线程池（NumPy / rasterio / GDAL 子进程都会释放 GIL）或进程池，
+    同时在途的任务数有上限，结果按提交顺序交付给调用线程（组合按代价升序提交，交付顺序也就是代价顺序），
+    因此界面信号仍在原线程中依次发出。已有结果（lookup 命中）不进入线程池，但仍按顺序交付。
+    """
+
+    def __init__(self, compositor: MosaicCompositor, workers: int = None, pool: str = POOL_THREAD):
+        self.compositor = compositor
+        self.workers = max(1, workers or default_workers())
+        self.pool = pool
+        # 在途任务上限：保证每个工作线程/进程手上都有下一个任务，又不会在提前终止时浪费太多
+        self.window = self.workers * 2
+
+    def _create_pool(self):
+        if self.pool == POOL_PROCESS:
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                       initargs=(self.compositor,))
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def _submit(self, executor, combination):
+        if self.pool == POOL_PROCESS:
+            return executor.submit(_composite_in_worker, [(image.tile, image.id) for image in combination])
+        return executor.submit(self._composite, combination)
+
+    def _composite(self, combination) -> list:
+        outputs = []
+        self.compositor.composite(combination, outputs.extend)
+        return outputs
+
+    def run(self, jobs: Iterable[Tuple[float, Sequence[Sentinel2TileItem]]],
+            deliver: Callable[[float, Sequence[Sentinel2TileItem], List[dict]], bool],
+            lookup: Callable[[Sequence[Sentinel2TileItem]], Optional[List[dict]]] = None):
+        """
+        :param jobs: (代价, 组合) 迭代器，按需拉取；调用方可在其中等待暂停或结束迭代
+        :param deliver: 按提交顺序接收 (代价, 组合, 回调输出列表)，返回 False 时停止并取消尚未开始的任务
+        :param lookup: 提交前查询已有结果，返回输出列表时直接交付，返回 None 时提交合成
+        """
+        jobs = iter(jobs)
+        pending = deque()
+        executor = self._create_pool()
+        try:
+            def fill():
+                while len(pending) < self.window:
+                    job = next(jobs, None)
+                    if job is None:
+                        return
+                    cost, combination = job
+                    outputs = lookup(combination) if lookup is not None else None
+                    if outputs is None:
+                        future = self._submit(executor, combination)
+                    else:
+                        future = Future()
+                        future.set_result(outputs)
+                    pending.append((cost, combination, future))
+
+            fill()
+            while pending:
+                cost, combination, future = pending.popleft()
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    print(f"镶嵌组合 {[image.id for image in combination]} 失败: {e}")
+                    outputs = []
+                if not deliver(cost, combination, outputs):
+                    break
+                fill()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
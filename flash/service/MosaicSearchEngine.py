@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/18 10:40
+import abc
+from typing import Dict, Iterator, List, Tuple
+
+from flash.model.SceneMaskTable import SceneMaskTable
+from flash.model.SearchBudget import SearchBudget
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+
+
+class SearchUnit:
+    """
+    搜索单元：集合覆盖中的一个“集合”。
+
+    key:     单元标识（如 MGRS_TILE）
+    options: 该单元可选的影像组，每个选项是一组 Sentinel2TileItem
+    masks:   每个选项覆盖 ROI 网格点的位掩码
+    weights: 每个选项的代价（云量等）
+    group:   互斥分组，同一覆盖集合内每组最多选一个单元（默认即 key）
+    """
+
+    def __init__(self, key, options: List[Tuple[Sentinel2TileItem, ...]], masks: List[int], weights: List[float],
+                 group=None):
+        self.key = key
+        self.group = key if group is None else group
+        self.options = options
+        self.masks = masks
+        self.weights = weights
+        # 单元的掩码取所有选项的并集，权重取最优选项，作为集合覆盖的乐观估计
+        self.mask = 0
+        for mask in masks:
+            self.mask |= mask
+        self.weight = min(weights) if weights else 0.0
+
+
+class MosaicSearchEngine(abc.ABC):
+    """
+    镶嵌组合搜索引擎：从按 tile 分组的影像中搜索能覆盖 ROI 的组合。
+
+    mask_table: ROI 网格上的影像有效掩码表，调用方可在搜索前写入更精确的掩码（缩略图 alpha、服务器采样），
+                并用它计算组合覆盖度
+    """
+
+    def __init__(self, mask_table: SceneMaskTable):
+        self.mask_table = mask_table
+
+    @abc.abstractmethod
+    def search_with_cost(self, tile_dict: Dict[str, List[Sentinel2TileItem]], budget: SearchBudget = None) \
+            -> Iterator[Tuple[float, Tuple[Sentinel2TileItem, ...]]]:
+        """按组合代价升序产出 (cost, combination)；给出 budget 时，枚举过程中到达时限即结束"""
+        pass
+
+    def search(self, tile_dict: Dict[str, List[Sentinel2TileItem]], budget: SearchBudget = None) \
+            -> Iterator[Tuple[Sentinel2TileItem, ...]]:
+        for _, combination in self.search_with_cost(tile_dict, budget):
+            yield combination
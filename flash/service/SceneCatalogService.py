@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/21 14:20
+import abc
+from typing import Dict, Iterable
+
+from flash.model.ConditionBuilder import ConditionBuilder
+from flash.model.VectorFile import VectorFile
+
+
+class SceneCatalogService(abc.ABC):
+    """本地影像元数据目录：按 (数据集, ROI) 缓存 GEE 元数据，增量刷新后在本地查询"""
+
+    @abc.abstractmethod
+    def sync(self, collection_id: str, roi: VectorFile, start_millis: int, end_millis: int) -> int:
+        """补齐 [start_millis, end_millis) 内尚未入库的影像，返回本次写入的数量"""
+        pass
+
+    @abc.abstractmethod
+    def query(self, collection_id: str, roi: VectorFile, condition: ConditionBuilder) -> dict:
+        """按条件在本地查询，返回与 ImageCollection.getInfo() 相同结构的字典"""
+        pass
+
+    @abc.abstractmethod
+    def get_footprints(self, roi_key: str, scene_ids: Iterable[str]) -> Dict[str, list]:
+        """已缓存的缩略图边界坐标（影像按 ROI 裁剪后的外接矩形），只返回命中的；与 ROI 不相交的为 None"""
+        pass
+
+    @abc.abstractmethod
+    def put_footprints(self, roi_key: str, footprints: Dict[str, list]):
+        pass
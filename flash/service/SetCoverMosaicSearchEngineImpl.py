@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/18 11:05
+from typing import Dict, Iterator, List, Tuple
+
+from flash.model.CombinationCost import CombinationCost
+from flash.model.Datatake import group_by_datatake
+from flash.model.SceneMaskTable import SceneMaskTable
+from flash.model.SearchBudget import SearchBudget
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+from flash.model.VectorFile import VectorFile
+from flash.service.MosaicSearchEngine import MosaicSearchEngine, SearchUnit
+from flash.util.best_first_util import merge_by_cost, merge_sources, size_lower_bounds
+from flash.util.coverage_util import FOOTPRINT_PROPERTY, full_mask
+from flash.util.temporal_util import windowed_best_first_product
+
+GREEDY = 'greedy'
+BRANCH_AND_BOUND = 'branch_and_bound'
+SEARCH_MODE_LIST = [GREEDY, BRANCH_AND_BOUND]
+UNIT_TILE = 'tile'
+UNIT_DATATAKE = 'datatake'
+SEARCH_UNIT_LIST = [UNIT_TILE, UNIT_DATATAKE]
+
+
+class SetCoverMosaicSearchEngineImpl(MosaicSearchEngine):
+    """
+    将“寻找能覆盖 ROI 的镶嵌组合”视为影像足迹上的加权集合覆盖问题。
+
+    第一阶段在 tile 层面求极小覆盖集合（greedy 近似 / branch_and_bound 精确枚举，
+    按集合大小由小到大输出，并跳过已覆盖集合的超集）；
+    同一 tile 下足迹不同的影像（轨道边缘只覆盖一部分）按极大掩码拆成互斥的子单元，
+    使每个单元的掩码都能由某一景影像真正取到，单元层面的覆盖/极小判断与影像层面一致；
+    第二阶段在每个极小覆盖集合内按组合代价最优优先展开具体影像组合，用位掩码剔除覆盖不全的组合，
+    多个覆盖集合的结果再按代价惰性合并，保证整体按代价升序输出。
+
+    unit=datatake 时以整次数据获取为单元：先只用 datatake 求覆盖，
+    不足的部分再用单 tile 影像补齐，得到同日无缝镶嵌，搜索空间也小得多。
+    """
+
+    def __init__(self, roi: VectorFile, mode: str = BRANCH_AND_BOUND, grid_size: int = 64,
+                 combination_cost: CombinationCost = None, unit: str = UNIT_TILE,
+                 max_date_spread_days: float = None):
+        if mode not in SEARCH_MODE_LIST:
+            raise ValueError(f"不支持的搜索模式: {mode}")
+        if unit not in SEARCH_UNIT_LIST:
+            raise ValueError(f"不支持的搜索单元: {unit}")
+        self.roi = roi
+        self.mode = mode
+        self.unit = unit
+        self.grid_size = grid_size
+        self.combination_cost = combination_cost or CombinationCost()
+        ## 组合内影像的最大时间跨度（天），None 表示不限制
+        self.max_date_spread_days = max_date_spread_days
+        ## 每景影像的有效掩码只算一次；外部可预先写入缩略图 alpha 或服务器批量采样的掩码
+        super().__init__(SceneMaskTable.from_roi(roi, grid_size))
+        self.full = full_mask(self.mask_table.point_count)
+        ## 当前搜索的预算，枚举循环内检查时限，长时间的覆盖枚举/组合展开也能按时中断
+        self.budget = None
+
+    def item_mask(self, item: Sentinel2TileItem) -> int:
+        """影像覆盖的网格点位掩码，掩码表中没有时用足迹计算"""
+        if item.id not in self.mask_table:
+            self.mask_table.add_footprint(item.id, item.sentinel2Image.properties.get(FOOTPRINT_PROPERTY))
+        return self.mask_table.mask_int(item.id)
+
+    def item_weight(self, item: Sentinel2TileItem) -> float:
+        """影像代价：云量百分比，缺失时按最差处理"""
+        cloud = item.sentinel2Image.CLOUDY_PIXEL_PERCENTAGE
+        return 100.0 if cloud is None else float(cloud)
+
+    def option_cost(self, option: Tuple[Sentinel2TileItem, ...]) -> float:
+        """选项的可分离代价"""
+        return sum(self.combination_cost.item_cost(item) for item in option)
+
+    def build_units(self, tile_dict: Dict[str, List[Sentinel2TileItem]]) -> List[SearchUnit]:
+        """每个 tile 构成搜索单元（足迹不一时拆为互斥子单元），选项为该 tile 下的单景影像（按代价升序）"""
+        units = []
+        for tile, items in tile_dict.items():
+            options = sorted([(item,) for item in items], key=self.option_cost)
+            masks = [self.item_mask(option[0]) for option in options]
+            parts = self._split_by_mask(masks)
+            for k, part in enumerate(parts):
+                unit = SearchUnit(tile if len(parts) == 1 else (tile, k),
+                                  options=[options[i] for i in part],
+                                  masks=[masks[i] for i in part],
+                                  weights=[self.option_cost(options[i]) for i in part],
+                                  group=tile)
+                # 与 ROI 不相交的 tile 对覆盖没有贡献
+                if unit.mask:
+                    units.append(unit)
+        return units
+
+    @staticmethod
+    def _split_by_mask(masks: List[int]) -> List[List[int]]:
+        """
+        按极大掩码划分选项下标：每个选项归入第一个包含它的极大掩码。
+
+        并集掩码会高估 tile 的覆盖（两景各覆盖一半时 tile 看起来能单独覆盖），
+        拆分后每个子单元的并集掩码就是其中某一景的掩码。
+        """
+        maximal = []
+        for mask in sorted(set(masks), key=lambda m: m.bit_count(), reverse=True):
+            if not any(mask & m == mask for m in maximal):
+                maximal.append(mask)
+        parts = [[] for _ in maximal]
+        for i, mask in enumerate(masks):
+            parts[next(k for k, m in enumerate(maximal) if mask & m == mask)].append(i)
+        return parts
+
+    def build_datatake_units(self, tile_dict: Dict[str, List[Sentinel2TileItem]]) -> List[SearchUnit]:
+        """每个 datatake 构成一个只有一个选项的搜索单元，同一 tile 有多景时取代价最小的一景"""
+        units = []
+        for datatake in group_by_datatake(item for items in tile_dict.values() for item in items):
+            best = {}
+            for item in datatake.items:
+                if item.tile not in best or self.option_cost((item,)) < self.option_cost((best[item.tile],)):
+                    best[item.tile] = item
+            option = tuple(best[tile] for tile in sorted(best))
+            mask = 0
+            for item in option:
+                mask |= self.item_mask(item)
+            unit = SearchUnit(datatake.key, options=[option], masks=[mask], weights=[self.option_cost(option)])
+            if unit.mask:
+                units.append(unit)
+        return units
+
+    def search_with_cost(self, tile_dict: Dict[str, List[Sentinel2TileItem]], budget: SearchBudget = None) \
+            -> Iterator[Tuple[float, Tuple[Sentinel2TileItem, ...]]]:
+        """按组合代价升序产出 (cost, combination)；到达 budget 时限后各枚举循环停止，输出随之结束"""
+        self.budget = budget
+        units = self.build_units(tile_dict)
+        if self.unit == UNIT_DATATAKE:
+            return self._unique(merge_by_cost(self._datatake_streams(tile_dict, units)))
+        bounds = size_lower_bounds([unit.weight for unit in units])
+        # 覆盖集合按大小非递减给出，k 个单元的组合代价不会低于 bounds[k]
+        streams = ((bounds[len(unit_set)], self.expand_unit_set(unit_set))
+                   for unit_set in self.find_covering_unit_sets(units))
+        return merge_by_cost(streams)
+
+    def _datatake_streams(self, tile_dict, tile_units: List[SearchUnit]):
+        """
+        整 datatake 覆盖 + 单个 datatake 加单 tile 补齐，按代价下界非递减惰性给出。
+
+        每个来源的覆盖集合按大小非递减产出，下界取 size_lower_bounds；
+        某个 datatake 的补齐集合只在其下界轮到最小时才开始搜索。
+        """
+        datatake_units = self.build_datatake_units(tile_dict)
+        datatake_bounds = size_lower_bounds([unit.weight for unit in datatake_units])
+        tile_bounds = size_lower_bounds([unit.weight for unit in tile_units])
+        sources = [(datatake_bounds[1] if datatake_units else 0.0,
+                    ((datatake_bounds[len(unit_set)], unit_set)
+                     for unit_set in self.find_covering_unit_sets(datatake_units)))]
+        for datatake_unit in sorted(datatake_units, key=lambda u: u.weight):
+            if datatake_unit.mask == self.full or not tile_units:
+                continue
+            sources.append((datatake_unit.weight + tile_bounds[1],
+                            self._fill_in_unit_sets(datatake_unit, tile_units, tile_bounds)))
+        for bound, unit_set in merge_sources(sources):
+            yield bound, self.expand_unit_set(unit_set)
+
+    def _fill_in_unit_sets(self, datatake_unit: SearchUnit, tile_units: List[SearchUnit], tile_bounds: List[float]):
+        remainder = self.full & ~datatake_unit.mask
+        for fill_in_set in self.find_covering_unit_sets(tile_units, remainder):
+            yield datatake_unit.weight + tile_bounds[len(fill_in_set)], [datatake_unit] + fill_in_set
+
+    def _expired(self) -> bool:
+        return self.budget is not None and self.budget.is_expired()
+
+    def _unique(self, ranked):
+        """datatake 与补齐 tile 可能选中同一组影像，只输出一次"""
+        seen = set()
+        for cost, combination in ranked:
+            key = frozenset(item.id for item in combination)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield cost, combination
+
+    def find_covering_unit_sets(self, units: List[SearchUnit], target: int = None) -> Iterator[List[SearchUnit]]:
+        """按模式求覆盖 target（默认整个 ROI）的极小单元集合"""
+        target = self.full if target is None else target
+        if self.mode == GREEDY:
+            return self._greedy_cover(units, target)
+        return self._branch_and_bound_covers(units, target)
+
+    def _union(self, units: List[SearchUnit]) -> int:
+        covered = 0
+        for unit in units:
+            covered |= unit.mask
+        return covered
+
+    def _greedy_cover(self, units: List[SearchUnit], target: int) -> Iterator[List[SearchUnit]]:
+        """贪心：每次选单位代价新增覆盖最多的单元，只给出一个近似最优覆盖"""
+        # 互斥子单元可能让贪心走进死路，依次换一个起始单元重试
+        firsts = sorted((u for u in units if u.mask & target),
+                        key=lambda u: -(u.mask & target).bit_count() / (u.weight + 1.0))
+        for first in firsts:
+            if self._expired():
+                return
+            chosen = self._greedy_from(units, target, first)
+            if chosen is not None:
+                yield chosen
+                return
+
+    def _greedy_from(self, units: List[SearchUnit], target: int, first: SearchUnit):
+        chosen = [first]
+        covered = first.mask & target
+        remaining = [u for u in units if u.group != first.group]
+        while covered != target:
+            if self._expired():
+                return None
+            best, best_score = None, 0.0
+            for unit in remaining:
+                gain = (unit.mask & target & ~covered).bit_count()
+                if gain == 0:
+                    continue
+                score = gain / (unit.weight + 1.0)
+                if score > best_score:
+                    best, best_score = unit, score
+            if best is None:
+                # 剩余单元合起来也无法覆盖 ROI
+                return None
+            chosen.append(best)
+            remaining = [u for u in remaining if u.group != best.group]
+            covered |= best.mask & target
+
+        # 去掉冗余单元（代价高的优先去掉），保证输出是极小覆盖
+        for unit in sorted(chosen, key=lambda u: u.weight, reverse=True):
+            rest = [u for u in chosen if u is not unit]
+            if self._union(rest) & target == target:
+                chosen = rest
+        return chosen
+
+    def _branch_and_bound_covers(self, units: List[SearchUnit], target: int) -> Iterator[List[SearchUnit]]:
+        """分支定界：按集合大小逐层枚举全部极小覆盖，同层按代价升序输出"""
+        units = sorted((u for u in units if u.mask & target),
+                       key=lambda u: (-(u.mask & target).bit_count(), u.weight))
+        suffix = [0] * (len(units) + 1)
+        for i in range(len(units) - 1, -1, -1):
+            suffix[i] = suffix[i + 1] | (units[i].mask & target)
+        if suffix[0] != target:
+            return
+
+        found = []  # 已输出覆盖集合的单元索引位集，用于跳过超集
+        for size in range(1, len(units) + 1):
+            level = []
+            self._collect_covers(units, suffix, target, size, 0, 0, 0, [], found, level)
+            if self._expired():
+                # 本层可能没有枚举完，不再输出
+                return
+            level.sort(key=lambda entry: sum(units[i].weight for i in entry[1]))
+            for chosen_bits, indices in level:
+                found.append(chosen_bits)
+                yield [units[i] for i in indices]
+
+    def _collect_covers(self, units, suffix, target, size, start, covered, chosen_bits, indices, found, level):
+        if self._expired():
+            return
+        if len(indices) == size:
+            if covered == target:
+                level.append((chosen_bits, list(indices)))
+            return
+        if covered == target:
+            # 规模未到就已覆盖，说明真子集可覆盖，不是极小集合
+            return
+        need = size - len(indices)
+        for i in range(start, len(units) - need + 1):
+            if covered | suffix[i] != target:
+                # 剩余单元全部选上也无法覆盖，后面的分支更不可能
+                break
+            unit = units[i]
+            if any(units[j].group == unit.group for j in indices):
+                # 同一 tile 的互斥子单元只能选一个
+                continue
+            if unit.mask & target & ~covered == 0:
+                # 不带来新覆盖的单元会让集合不再极小
+                continue
+            bits = chosen_bits | (1 << i)
+            if any(f & bits == f for f in found):
+                # 已覆盖集合的超集直接跳过
+                continue
+            indices.append(i)
+            self._collect_covers(units, suffix, target, size, i + 1, covered | (unit.mask & target), bits,
+                                 indices, found, level)
+            indices.pop()
+
+    def expand_unit_set(self, unit_set: List[SearchUnit]) -> Iterator[Tuple[float, Tuple[Sentinel2TileItem, ...]]]:
+        """在单元集合内按代价升序展开具体影像组合，只输出真正覆盖 ROI 的组合"""
+        lists = [list(zip(unit.options, unit.masks)) for unit in unit_set]
+
+        def element_cost(element):
+            return self.option_cost(element[0])
+
+        def penalty(combo):
+            return self.combination_cost.penalty([item for option, _ in combo for item in option])
+
+        def time_of(element):
+            return min(item.sentinel2Image.system_time_start or 0 for item in element[0])
+
+        for cost, combo in windowed_best_first_product(lists, element_cost, penalty,
+                                                       self.max_date_spread_days, time_of):
+            if self._expired():
+                return
+            covered = 0
+            for _, mask in combo:
+                covered |= mask
+            items = [item for option, _ in combo for item in option]
+            if len({item.id for item in items}) < len(items):
+                # 补齐 tile 选中了 datatake 内已有的影像，不是极小组合
+                continue
+            if covered == self.full and self._is_minimal([mask for _, mask in combo]):
+                yield cost, self.stack_order(items)
+
+    def _is_minimal(self, masks: List[int]) -> bool:
+        """去掉任意一个选项后都不能再覆盖 ROI"""
+        prefix = [0] * (len(masks) + 1)
+        for i, mask in enumerate(masks):
+            prefix[i + 1] = prefix[i] | mask
+        suffix = 0
+        for i in range(len(masks) - 1, -1, -1):
+            if prefix[i] | suffix == self.full:
+                return False
+            suffix |= masks[i]
+        return True
+
+    def stack_order(self, items: List[Sentinel2TileItem]) -> Tuple[Sentinel2TileItem, ...]:
+        """镶嵌时后面的影像覆盖前面的，云量最少的放最后"""
+        return tuple(sorted(items, key=self.item_weight, reverse=True))
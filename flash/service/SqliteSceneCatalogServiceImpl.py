@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/21 14:35
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, Iterable, List, Tuple
+from datetime import datetime, timezone
+
+import ee
+
+from flash.model.ConditionBuilder import ConditionBuilder
+from flash.model.Sentinel2Image import METADATA_COLUMNS, METADATA_FETCH_COLUMNS, columns_to_features
+from flash.model.VectorFile import VectorFile
+from flash.service.SceneCatalogService import SceneCatalogService
+from flash.util.GEEScriptFunUtil import fetch_collection_columns
+from flash.util.vector_util import prepare_roi
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scene (
+    collection TEXT NOT NULL,
+    roi_hash   TEXT NOT NULL,
+    id         TEXT NOT NULL,
+    mgrs_tile  TEXT,
+    time_start INTEGER,
+    cloud      REAL,
+    feature    TEXT NOT NULL,
+    PRIMARY KEY (collection, roi_hash, id)
+);
+CREATE INDEX IF NOT EXISTS idx_scene_tile ON scene (collection, roi_hash, mgrs_tile);
+CREATE INDEX IF NOT EXISTS idx_scene_time ON scene (collection, roi_hash, time_start);
+CREATE INDEX IF NOT EXISTS idx_scene_cloud ON scene (collection, roi_hash, cloud);
+CREATE TABLE IF NOT EXISTS sync_interval (
+    collection   TEXT NOT NULL,
+    roi_hash     TEXT NOT NULL,
+    synced_start INTEGER NOT NULL,
+    synced_end   INTEGER NOT NULL,
+    updated_at   REAL,
+    PRIMARY KEY (collection, roi_hash, synced_start)
+);
+CREATE TABLE IF NOT EXISTS footprint (
+    roi_key TEXT NOT NULL,
+    id      TEXT NOT NULL,
+    bounds  TEXT NOT NULL,
+    PRIMARY KEY (roi_key, id)
+);
+"""
+
+
+def date_to_millis(date: str) -> int:
+    """'yyyy-MM-dd' 转 UTC 毫秒，与 ee.Date(date).millis() 一致"""
+    return int(datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """合并相交或首尾相接的半开区间 [start, end)，丢弃空区间，按起点升序返回"""
+    merged = []
+    for start, end in sorted(r for r in ranges if r[0] < r[1]):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(synced: Iterable[Tuple[int, int]], start: int, end: int) -> List[Tuple[int, int]]:
+    """[start, end) 中不被任何已入库区间覆盖的部分"""
+    gaps = []
+    cursor = start
+    for synced_start, synced_end in merge_ranges(synced):
+        if synced_end <= cursor:
+            continue
+        if synced_start >= end:
+            break
+        if synced_start > cursor:
+            gaps.append((cursor, synced_start))
+        cursor = max(cursor, synced_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class SqliteSceneCatalogServiceImpl(SceneCatalogService):
+    """
+    SQLite 影像元数据目录，按 (数据集, ROI 内容哈希) 分区。
+
+    每个分区记录若干个已完整入库的时间区间 [synced_start, synced_end)，刷新时只拉取查询区间中未覆盖的部分，
+    与已入库区间不相邻的查询不会把中间的空档也拉下来。
+    拉取区间超出已入库的最晚时间时，只记录到拉到的最后一景为止：GEE 入库有延迟，下次从这一景起重叠拉取，按 id 覆盖写入。
+
+    入库时不加云量条件，云量阈值改变后仍可直接在本地查询。
+    """
+
+    def __init__(self, db_path: str, fetch_mode=METADATA_FETCH_COLUMNS, page_size=2000):
+        self.db_path = db_path
+        self.fetch_mode = fetch_mode
+        self.page_size = page_size
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self):
+        # 每次操作单独连接，可以在任意线程中调用
+        return sqlite3.connect(self.db_path)
+
+    def sync(self, collection_id: str, roi: VectorFile, start_millis: int, end_millis: int) -> int:
+        roi_hash = roi.content_hash()
+        synced = self._sync_intervals(collection_id, roi_hash)
+        latest_end = max((synced_end for _, synced_end in synced), default=None)
+        gaps = missing_ranges(synced, start_millis, end_millis)
+        if not gaps:
+            return 0
+
+        written = 0
+        roi_ee = prepare_roi(roi).ee_geometry
+        for gap_start, gap_end in gaps:
+            features = self._fetch(collection_id, roi_ee, gap_start, gap_end)
+            written += self._upsert(collection_id, roi_hash, features)
+            if latest_end is None or gap_end > latest_end:
+                ## 最新的一段可能还有未入库的影像，只记到拉到的最后一景
+                times = [feature.get('properties', {}).get('system:time_start') for feature in features]
+                gap_end = max([gap_start] + [t for t in times if t is not None and t < gap_end])
+            synced.append((gap_start, gap_end))
+        self._save_sync_intervals(collection_id, roi_hash, merge_ranges(synced))
+        return written
+
+    def query(self, collection_id: str, roi: VectorFile, condition: ConditionBuilder) -> dict:
+        where, params = condition.to_sql()
+        sql = (f"SELECT feature FROM scene WHERE collection = ? AND roi_hash = ? AND ({where}) "
+               f"ORDER BY mgrs_tile, time_start")
+        with closing(self._connect()) as connection:
+            rows = connection.execute(sql, [collection_id, roi.content_hash()] + params).fetchall()
+        return {'type': 'ImageCollection', 'features': [json.loads(row[0]) for row in rows]}
+
+    def get_footprints(self, roi_key: str, scene_ids: Iterable[str]) -> Dict[str, list]:
+        scene_ids = list(scene_ids)
+        footprints = {}
+        with closing(self._connect()) as connection:
+            # 分块查询，避免超过 SQLite 参数个数上限
+            for start in range(0, len(scene_ids), 500):
+                chunk = scene_ids[start:start + 500]
+                rows = connection.execute(
+                    f"SELECT id, bounds FROM footprint WHERE roi_key = ? AND id IN ({', '.join('?' * len(chunk))})",
+                    [roi_key] + chunk).fetchall()
+                footprints.update((scene_id, json.loads(bounds)) for scene_id, bounds in rows)
+        return footprints
+
+    def put_footprints(self, roi_key: str, footprints: Dict[str, list]):
+        with closing(self._connect()) as connection, connection:
+            connection.executemany("INSERT OR REPLACE INTO footprint VALUES (?, ?, ?)",
+                                   [(roi_key, scene_id, json.dumps(bounds))
+                                    for scene_id, bounds in footprints.items()])
+
+    def _fetch(self, collection_id: str, roi_ee, start_millis: int, end_millis: int) -> list:
+        builder = (
+            ConditionBuilder()
+            .add("system:time_start", "gte", start_millis)
+            .add("system:time_start", "lt", end_millis)
+            .add('geometry', 'bounds', roi_ee)
+            .and_()
+        )
+        collection = ee.ImageCollection(collection_id).filter(builder.build())
+        if self.fetch_mode == METADATA_FETCH_COLUMNS:
+            return columns_to_features(fetch_collection_columns(collection, METADATA_COLUMNS, self.page_size))
+        return collection.getInfo().get('features', [])
+
+    def _upsert(self, collection_id: str, roi_hash: str, features: list) -> int:
+        rows = []
+        for feature in features:
+            properties = feature.get('properties', {})
+            rows.append((collection_id, roi_hash, feature.get('id'), properties.get('MGRS_TILE'),
+                         properties.get('system:time_start'), properties.get('CLOUDY_PIXEL_PERCENTAGE'),
+                         json.dumps(feature)))
+        with closing(self._connect()) as connection, connection:
+            connection.executemany("INSERT OR REPLACE INTO scene VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _sync_intervals(self, collection_id: str, roi_hash: str) -> List[Tuple[int, int]]:
+        with closing(self._connect()) as connection:
+            return [tuple(row) for row in connection.execute(
+                "SELECT synced_start, synced_end FROM sync_interval WHERE collection = ? AND roi_hash = ? "
+                "ORDER BY synced_start", (collection_id, roi_hash)).fetchall()]
+
+    def _save_sync_intervals(self, collection_id: str, roi_hash: str, intervals: List[Tuple[int, int]]):
+        updated_at = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM sync_interval WHERE collection = ? AND roi_hash = ?",
+                               (collection_id, roi_hash))
+            connection.executemany("INSERT INTO sync_interval VALUES (?, ?, ?, ?, ?)",
+                                   [(collection_id, roi_hash, synced_start, synced_end, updated_at)
+                                    for synced_start, synced_end in intervals])
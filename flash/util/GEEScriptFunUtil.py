@@ -1,12 +1,93 @@
 # -*- coding: utf-8 -*-            
 # @Author : ZXQ
 # @Time : 2025/9/12 9:02
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 import ee
 import geemap
+import numpy as np
 
 from flash.model.VectorFile import VectorFile
+from flash.util.vector_util import prepare_roi
+
+QUALITY_BAND = 'quality'
+QUALITY_SOURCE_SCL = 'scl'
+QUALITY_SOURCE_CLOUD_PROBABILITY = 'cloud_probability'
+# SCL 类别 0-11 对应的质量分：植被/裸土/水体高，云/云影/卷云/饱和/无数据低
+SCL_CLASSES = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+SCL_QUALITY = [0, 5, 30, 10, 100, 100, 90, 60, 10, 5, 15, 70]
+
+
+def add_quality_band(image: ee.Image, source=QUALITY_SOURCE_SCL) -> ee.Image:
+    """添加逐像素质量分波段（0-100，越大越好），供 qualityMosaic 使用"""
+    if source == QUALITY_SOURCE_CLOUD_PROBABILITY:
+        quality = ee.Image(100).subtract(image.select('MSK_CLDPRB'))
+    else:
+        quality = image.select('SCL').remap(SCL_CLASSES, SCL_QUALITY, 0)
+    return image.addBands(quality.rename(QUALITY_BAND).toUint8())
+
+
+def quality_mosaic(images, source=QUALITY_SOURCE_SCL) -> ee.Image:
+    """按逐像素质量分合成，与影像顺序无关"""
+    return ee.ImageCollection(images).map(lambda img: add_quality_band(img, source)).qualityMosaic(QUALITY_BAND)
+
+
+def fetch_collection_columns(collection: ee.ImageCollection, columns: List[str],
+                             page_size=2000) -> Dict[str, list]:
+    """
+    只取指定属性列，按 system:time_start 排序后分页 getInfo，返回 {列名: 等长列表}。
+
+    每景投影为一行 ee.List 再 aggregate_array，缺失属性保留为 None，各列始终对齐
+    （reduceColumns 会丢弃含空值的行）。
+    """
+    ordered = collection.sort('system:time_start')
+    result = {column: [] for column in columns}
+    offset = 0
+    while True:
+        page = ee.ImageCollection(ordered.toList(page_size, offset))
+        rows = page.map(
+            lambda image: ee.Feature(None, {'row': ee.List([image.get(column) for column in columns])})
+        ).aggregate_array('row').getInfo()
+        for row in rows:
+            for column, value in zip(columns, row):
+                result[column].append(value)
+        if len(rows) < page_size:
+            return result
+        offset += page_size
+
+
+def batch_clipped_bounds(image_ids: List[str], region: ee.Geometry) -> List[list]:
+    """
+    一次 getInfo：服务器端对所有影像计算 clip(region) 后几何的外接矩形坐标环，顺序与 image_ids 一致。
+
+    与 ROI 不相交的影像返回 None。
+    """
+    bounds = ee.List(list(image_ids)).map(
+        lambda image_id: ee.Image(image_id).clip(region).geometry().bounds().coordinates()
+    ).getInfo()
+    return [ring[0] if ring else None for ring in bounds]
+
+
+def compute_visualized_pixels(image: ee.Image, grid: dict, vis_params: Dict, quality_source=None) -> np.ndarray:
+    """
+    ee.data.computePixels 按指定网格直接取像素为 NumPy 数组，不经过 PNG 编解码。
+
+    波段顺序与缩略图 PNG 转 tif 一致：R、G、B、alpha（有效像素 255），质量模式下最后加质量分波段。
+
+    :param grid: computePixels 的 grid 参数（dimensions、affineTransform、crsCode）
+    :return: (波段数, 高, 宽) 的 uint8 数组
+    """
+    expression = image.visualize(**vis_params).unmask(0).addBands(
+        image.select(vis_params['bands'][0]).mask().multiply(255).toUint8().rename('alpha'))
+    if quality_source is not None:
+        expression = expression.addBands(
+            add_quality_band(image, quality_source).select(QUALITY_BAND).unmask(0).toUint8())
+    pixels = ee.data.computePixels({
+        'expression': expression,
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': grid,
+    })
+    return np.stack([pixels[name] for name in pixels.dtype.names]).astype(np.uint8)
 
 
 def calculate_pixel_coverage(image: ee.Image, roi, scale=30):
@@ -48,7 +129,7 @@ def is_img_cover_roi(image, roi):
 
 def is_img_cover_roi_ret_area(image: ee.Image, roi: VectorFile):
     """GEE版本简化函数"""
-    roi = geemap.shp_to_ee(roi.file_path)
+    roi = prepare_roi(roi).ee_feature_collection
     coverage = calculate_pixel_coverage(image, roi)
     return coverage['is_fully_covered'].getInfo(), coverage['uncovered_area_km2'].getInfo()
 
@@ -2,9 +2,12 @@ import hashlib
 import os
 import shutil
 import subprocess
+import tempfile
 
 import rasterio
-from rasterio.transform import from_bounds
+from rasterio.features import geometry_mask
+from rasterio.transform import from_bounds, from_origin
+from rasterio.windows import Window
 from PIL import Image
 import numpy as np
 
@@ -57,7 +60,18 @@ def create_mosaic_with_gdal(image_list, base_path, write_thumbnail_to_file_callb
     :param output_tif_path: (可选) 输出的最终 GeoTIFF 文件的完整路径。
     """
     os.makedirs(os.path.join(base_path, 'mosaic'), exist_ok=True)  ###性能优化，这里一直调用
-    output_vrt_path = os.path.join(base_path, 'mosaic', 'mosaic.vrt').replace('\\', '/')
+    # 每次调用使用独立的临时目录存放文件列表和 VRT，多个镶嵌可以同时进行
+    work_dir = tempfile.mkdtemp(prefix='job_', dir=os.path.join(base_path, 'mosaic'))
+    try:
+        _create_mosaic_with_gdal(image_list, base_path, write_thumbnail_to_file_callback, gdal_bin_path, pixel_size,
+                                 work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _create_mosaic_with_gdal(image_list, base_path, write_thumbnail_to_file_callback, gdal_bin_path, pixel_size,
+                             work_dir):
+    output_vrt_path = os.path.join(work_dir, 'mosaic.vrt').replace('\\', '/')
     output_tif_path = os.path.join(base_path, 'mosaic')
     # 1. 生成所有待镶嵌影像的完整路径列表
     file_paths = []
@@ -78,7 +92,7 @@ def create_mosaic_with_gdal(image_list, base_path, write_thumbnail_to_file_callb
     # -input_file_list: 从一个文本文件中读取输入文件列表，避免命令行过长
 
     # 为了处理大量文件，最好将文件列表写入一个临时文件
-    file_list_txt = 'file_list.txt'
+    file_list_txt = os.path.join(work_dir, 'file_list.txt')
     with open(file_list_txt, 'w') as f:
         f.write('\n'.join(file_paths))
     ## if file_paths is one 那么直接复制即可不需要镶嵌mosaic
@@ -151,10 +165,11 @@ def create_mosaic_with_gdal(image_list, base_path, write_thumbnail_to_file_callb
 
 
 
-def png_to_geotiff_with_rasterio(png_path, coordinates, output_path):
+def png_to_geotiff_with_rasterio(png_path, coordinates, output_path, quality_png_path=None):
     """
     使用rasterio将PNG转换为GeoTIFF。
     该函数会自动从传入的坐标列表中计算出正确的地理边界。
+    传入 quality_png_path 时，质量分缩略图作为最后一个波段写入，供逐像素质量合成使用。
     """
     # 从坐标列表中提取外接矩形边界
     # 假设坐标列表格式为 [[lon1, lat1], [lon2, lat2], ...]
@@ -187,6 +202,13 @@ def png_to_geotiff_with_rasterio(png_path, coordinates, output_path):
         bands = 1
         img_array = img_array.reshape(1, height, width)
 
+    if quality_png_path:
+        quality = read_quality_png(quality_png_path, height, width)
+        if quality is None:
+            return
+        img_array = np.concatenate([img_array, quality.astype(img_array.dtype)[np.newaxis]], axis=0)
+        bands += 1
+
     # 创建仿射变换
     transform = from_bounds(west, south, east, north, width, height)
 
@@ -210,5 +232,233 @@ def png_to_geotiff_with_rasterio(png_path, coordinates, output_path):
         print(f"写入GeoTIFF时发生错误: {e}")
 
 
+def pixel_grid_for_bounds(coordinates, dimensions):
+    """
+    按外接矩形和长边像素数确定 EPSG:4326 下的取数网格，像素为正方形。
+
+    :return: (computePixels 的 grid 参数, rasterio 仿射变换)，两者描述同一个网格
+    """
+    lons = [c[0] for c in coordinates]
+    lats = [c[1] for c in coordinates]
+    west, south, east, north = min(lons), min(lats), max(lons), max(lats)
+    scale = max(east - west, north - south) / dimensions
+    width = max(1, int(np.ceil((east - west) / scale)))
+    height = max(1, int(np.ceil((north - south) / scale)))
+    grid = {
+        'dimensions': {'width': width, 'height': height},
+        'affineTransform': {'scaleX': scale, 'shearX': 0, 'translateX': west,
+                            'shearY': 0, 'scaleY': -scale, 'translateY': north},
+        'crsCode': 'EPSG:4326',
+    }
+    return grid, from_origin(west, north, scale, scale)
+
+
+def snapped_pixel_grid(west, south, east, north, resolution):
+    """
+    按固定分辨率（度）对齐到全球统一格网：同一分辨率下任意两个网格的像元边界重合，
+    影像级缩略图可以直接按窗口裁剪到任意 ROI，不需要重采样。
+
+    :return: (computePixels 的 grid 参数, rasterio 仿射变换, (高, 宽))
+    """
+    col0 = int(np.floor(west / resolution + 1e-9))
+    col1 = int(np.ceil(east / resolution - 1e-9))
+    row0 = int(np.floor(-north / resolution + 1e-9))
+    row1 = int(np.ceil(-south / resolution - 1e-9))
+    width, height = max(1, col1 - col0), max(1, row1 - row0)
+    grid = {
+        'dimensions': {'width': width, 'height': height},
+        'affineTransform': {'scaleX': resolution, 'shearX': 0, 'translateX': col0 * resolution,
+                            'shearY': 0, 'scaleY': -resolution, 'translateY': -row0 * resolution},
+        'crsCode': 'EPSG:4326',
+    }
+    return grid, from_origin(col0 * resolution, -row0 * resolution, resolution, resolution), (height, width)
+
+
+def roi_grid_mask(roi_geometry, resolution):
+    """ROI 在统一格网上的外接窗口和栅格化掩码（True 为 ROI 内），同一 ROI 只需计算一次"""
+    _, transform, shape = snapped_pixel_grid(*roi_geometry.bounds, resolution)
+    inside = geometry_mask([roi_geometry], out_shape=shape, transform=transform, invert=True, all_touched=True)
+    return transform, inside
+
+
+def crop_geotiff_to_grid(src_path, transform, inside, output_path):
+    """
+    按统一格网上的窗口裁剪影像级缩略图并应用 ROI 掩码，窗口超出影像的部分填 0（alpha 为 0 即无数据）。
+    """
+    height, width = inside.shape
+    with rasterio.open(src_path) as src:
+        col_off = int(round((transform.c - src.transform.c) / src.transform.a))
+        row_off = int(round((transform.f - src.transform.f) / src.transform.e))
+        window = Window(col_off, row_off, width, height)
+        data = src.read(window=window, boundless=True, fill_value=0)
+    data[:, ~inside] = 0
+    array_to_geotiff(data, transform, output_path)
+
+
+def array_to_geotiff(array, transform, output_path):
+    """(波段数, 高, 宽) 数组按给定仿射变换直接写入 GeoTIFF，参数与 png_to_geotiff_with_rasterio 一致"""
+    bands, height, width = array.shape
+    with rasterio.open(
+            output_path,
+            'w',
+            driver='GTiff',
+            height=height,
+            width=width,
+            count=bands,
+            dtype=array.dtype,
+            crs='EPSG:4326',
+            transform=transform,
+            compress='lzw'
+    ) as dst:
+        dst.write(array)
+
+
+def read_quality_png(quality_png_path, height, width):
+    """读取质量分缩略图，透明（无数据）像素的质量记为 0"""
+    try:
+        with Image.open(quality_png_path) as img:
+            quality_array = np.array(img)
+    except FileNotFoundError:
+        print(f"错误: 文件 '{quality_png_path}' 未找到。请确保路径正确。")
+        return None
+
+    if quality_array.ndim == 3:
+        quality = quality_array[..., 0].copy()
+        if quality_array.shape[2] in (2, 4):
+            quality[quality_array[..., -1] == 0] = 0
+    else:
+        quality = quality_array
+    if quality.shape != (height, width):
+        print(f"质量分缩略图尺寸 {quality.shape} 与影像 {(height, width)} 不一致，跳过: {quality_png_path}")
+        return None
+    return quality
+
+
+def copy_best_quality(merged_data, new_data, merged_mask, new_mask, **kwargs):
+    """rasterio.merge 自定义合成方法：最后一个波段为质量分，逐像素保留质量分更高的影像"""
+    # 源数据没有被掩盖的像素时 rasterio 传入标量掩码
+    merged_mask = np.broadcast_to(merged_mask, merged_data.shape)
+    new_mask = np.broadcast_to(new_mask, new_data.shape)
+    better = (new_data[-1] > merged_data[-1]) | merged_mask[-1]
+    better &= ~new_mask[-1]
+    np.copyto(merged_data, new_data, where=better[np.newaxis], casting='unsafe')
+
+
+def create_quality_mosaic_with_rasterio(image_list, base_path, write_thumbnail_to_file_callback, pixel_size):
+    """
+    逐像素质量合成：与影像顺序无关，同一组影像只需合成一次。
+
+    :param image_list: 包含 tile / id 的影像对象列表，缩略图 tif 最后一个波段为质量分
+    :param base_path: 存放影像的根目录
+    """
+    output_dir = os.path.join(base_path, 'mosaic')
+    os.makedirs(output_dir, exist_ok=True)
+    file_paths = []
+    for image in image_list:
+        tif_path = os.path.join(base_path, image.tile, image.id + f'_{pixel_size}.tif')
+        if os.path.exists(tif_path):
+            file_paths.append(tif_path)
+        else:
+            print(f"警告：文件不存在，将跳过: {tif_path}")
+
+    if not file_paths:
+        print("错误：没有找到任何有效的影像文件进行镶嵌。")
+        return
+
+    # 顺序无关，按 id 排序得到规范的组合标识
+    item_ids = ','.join(sorted(os.path.basename(obj.id) for obj in image_list))
+    file_name = os.path.join(output_dir, item_ids + '.tif').replace('\\', '/')
+    file_name_new = os.path.join(output_dir, generate_md5_filename(file_name)).replace('\\', '/')
+
+    try:
+        datasets = [rasterio.open(path) for path in file_paths]
+        try:
+            mosaic, transform = merge(datasets, nodata=0, method=copy_best_quality)
+            profile = datasets[0].profile
+        finally:
+            for dataset in datasets:
+                dataset.close()
+
+        # 源影像的条带块大小不能用于分块输出
+        profile.pop('blockxsize', None)
+        profile.pop('blockysize', None)
+        profile.update(driver='GTiff', height=mosaic.shape[1], width=mosaic.shape[2], count=mosaic.shape[0],
+                       transform=transform, nodata=0, compress='lzw', tiled=True, bigtiff='YES')
+        with rasterio.open(file_name_new, 'w', **profile) as dst:
+            dst.write(mosaic)
+
+        ### 输出png（去掉质量分波段）
+        file_name_png = file_name_new.replace('.tif', '.png')
+        Image.fromarray(np.transpose(mosaic[:-1], (1, 2, 0)).astype(np.uint8)).save(file_name_png, 'png')
+        write_thumbnail_to_file_callback(
+            [{'thumbnail_url': file_name_png, 'item_ids': item_ids}])
+        print("质量合成 GeoTIFF 生成成功！")
+    except Exception as e:
+        print(f"质量合成时出错: {e}")
+
+
+def union_grid(tif_paths):
+    """
+    覆盖所有输入影像的目标网格：范围取并集，分辨率取平均（与 gdalbuildvrt 默认一致）。
+
+    :return: (仿射变换, (高, 宽))，没有可读影像时返回 None
+    """
+    bounds, resolutions = [], []
+    for path in tif_paths:
+        with rasterio.open(path) as src:
+            bounds.append(src.bounds)
+            resolutions.append(src.res)
+    if not bounds:
+        return None
+    west, south = min(b.left for b in bounds), min(b.bottom for b in bounds)
+    east, north = max(b.right for b in bounds), max(b.top for b in bounds)
+    res_x, res_y = np.mean(resolutions, axis=0)
+    width = max(1, int(round((east - west) / res_x)))
+    height = max(1, int(round((north - south) / res_y)))
+    return from_origin(west, north, res_x, res_y), (height, width)
+
+
+def read_aligned_array(tif_path, transform, shape):
+    """读取影像并对齐到目标网格（最近邻），网格外填 0；已对齐时等价于按窗口复制"""
+    with rasterio.open(tif_path) as src:
+        aligned = np.zeros((src.count,) + tuple(shape), dtype=src.dtypes[0])
+        reproject(source=src.read(), destination=aligned, src_transform=src.transform, src_crs=src.crs,
+                  dst_transform=transform, dst_crs=src.crs, src_nodata=0, dst_nodata=0,
+                  resampling=Resampling.nearest)
+    return aligned
+
+
+def paint_in_order(mosaic, array):
+    """原地叠加一景：在其 alpha（第 4 波段）有效处覆盖已有结果，与 VRT 的叠加顺序一致"""
+    np.copyto(mosaic, array, where=(array[3] > 0)[np.newaxis])
+
+
+def paint_best_quality(mosaic, array):
+    """原地叠加一景：逐像素保留质量分（最后一个波段）更高者，与 copy_best_quality 的规则一致"""
+    better = (array[3] > 0) & ((array[-1] > mosaic[-1]) | (mosaic[3] == 0))
+    np.copyto(mosaic, array, where=better[np.newaxis])
+
+
+def crop_to_valid(mosaic, transform):
+    """裁掉四周 alpha 为 0 的空白行列，全部无效时返回 None"""
+    valid = mosaic[3] > 0
+    rows, cols = np.flatnonzero(valid.any(axis=1)), np.flatnonzero(valid.any(axis=0))
+    if rows.size == 0:
+        return None, transform
+    row0, row1, col0, col1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    return mosaic[:, row0:row1, col0:col1], transform * transform.translation(col0, row0)
+
+
+def write_mosaic_outputs(mosaic, transform, png_path, tif_path=None):
+    """从内存直接写预览 PNG（前 4 个波段 RGBA），可选写 GeoTIFF"""
+    # 预览图优先编码速度，压缩级别取 1
+    Image.fromarray(np.transpose(mosaic[:4], (1, 2, 0)).astype(np.uint8)).save(png_path, 'png', compress_level=1)
+    if tif_path:
+        with rasterio.open(tif_path, 'w', driver='GTiff', height=mosaic.shape[1], width=mosaic.shape[2],
+                           count=mosaic.shape[0], dtype=mosaic.dtype, crs='EPSG:4326', transform=transform,
+                           nodata=0, compress='lzw', tiled=True) as dst:
+            dst.write(mosaic)
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/18 15:35
+"""
+最优优先（k-best）组合枚举：不展开笛卡尔积，按代价从小到大惰性产出组合。
+"""
+import heapq
+import itertools
+import math
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# merge_sources 中尚未取出下一项的来源
+_PENDING = object()
+
+
+def best_first_product(lists: Sequence[Sequence], element_cost: Callable,
+                       penalty: Optional[Callable] = None) -> Iterator[Tuple[float, tuple]]:
+    """
+    按 sum(element_cost) + penalty(combo) 升序产出 lists 的笛卡尔积。
+
+    可分离部分用堆做 k-best 扩展：每个索引向量只从“最后一个非零位置”递减得到的父节点扩展而来，
+    无需 seen 集合。penalty 非负，所以当待输出组合的总代价不大于前沿最小可分离代价时即可安全输出。
+
+    :return: (cost, combo) 迭代器
+    """
+    if not lists or any(len(candidates) == 0 for candidates in lists):
+        return
+    ordered = [sorted(candidates, key=element_cost) for candidates in lists]
+    costs = [[element_cost(x) for x in candidates] for candidates in ordered]
+    counter = itertools.count()
+
+    start = (0,) * len(ordered)
+    frontier = [(sum(c[0] for c in costs), start)]
+    ready = []
+    while frontier:
+        separable, index = heapq.heappop(frontier)
+        combo = tuple(ordered[k][i] for k, i in enumerate(index))
+        total = separable + (penalty(combo) if penalty else 0.0)
+        heapq.heappush(ready, (total, next(counter), combo))
+
+        last = max((k for k, i in enumerate(index) if i), default=0)
+        for k in range(last, len(index)):
+            if index[k] + 1 < len(ordered[k]):
+                child = index[:k] + (index[k] + 1,) + index[k + 1:]
+                heapq.heappush(frontier, (separable - costs[k][index[k]] + costs[k][index[k] + 1], child))
+
+        bound = frontier[0][0] if frontier else math.inf
+        while ready and ready[0][0] <= bound:
+            total, _, combo = heapq.heappop(ready)
+            yield total, combo
+
+
+def merge_by_cost(streams: Iterable[Tuple[float, Iterator[Tuple[float, tuple]]]]) -> Iterator[Tuple[float, tuple]]:
+    """
+    惰性合并多个按代价升序的组合流。
+
+    :param streams: 按下界非递减给出的 (lower_bound, stream)；只有当下一个流的下界
+                    不大于当前最小代价时才激活它，因此流本身也可以是惰性生成的
+    """
+    heap = []
+    counter = itertools.count()
+    streams = iter(streams)
+    pending = next(streams, None)
+
+    def activate(stream):
+        head = next(stream, None)
+        if head is not None:
+            heapq.heappush(heap, (head[0], next(counter), head[1], stream))
+
+    while heap or pending is not None:
+        while pending is not None and (not heap or pending[0] <= heap[0][0]):
+            activate(pending[1])
+            pending = next(streams, None)
+        if not heap:
+            continue
+        cost, _, combo, stream = heapq.heappop(heap)
+        yield cost, combo
+        activate(stream)
+
+
+def merge_sources(sources: Iterable[Tuple[float, Iterator[Tuple[float, Any]]]]) -> Iterator[Tuple[float, Any]]:
+    """
+    按下界非递减合并多个 (bound, item) 序列，用于惰性生成 merge_by_cost 需要的 (lower_bound, stream)。
+
+    :param sources: (start_bound, source)；source 自身按 bound 非递减产出且不低于 start_bound。
+                    来源只在其当前下界成为全局最小时才取下一项，尚未轮到的来源不会开始计算
+    """
+    heap = []
+    counter = itertools.count()
+    for start_bound, source in sources:
+        heapq.heappush(heap, (start_bound, next(counter), _PENDING, iter(source)))
+    while heap:
+        bound, _, item, source = heapq.heappop(heap)
+        if item is not _PENDING:
+            yield bound, item
+            # 下一项不低于当前下界，等再次成为最小时再取
+            heapq.heappush(heap, (bound, next(counter), _PENDING, source))
+            continue
+        head = next(source, None)
+        if head is not None:
+            heapq.heappush(heap, (head[0], next(counter), head[1], source))
+
+
+def size_lower_bounds(min_costs: Sequence[float]) -> List[float]:
+    """bounds[k]：任意 k 个单元组合的代价下界（k 个最小单元代价之和）"""
+    bounds = [0.0]
+    for cost in sorted(min_costs):
+        bounds.append(bounds[-1] + cost)
+    return bounds
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/18 10:12
+"""
+本地覆盖计算工具：把 ROI 栅格化为规则网格点，影像足迹转为 shapely 面。
+网格点上的位掩码见 SceneMaskTable，组合是否覆盖 ROI 只需做按位或运算，不再需要调用 GEE。
+"""
+import numpy as np
+import shapely
+from shapely.geometry import Polygon, shape
+
+from flash.model.VectorFile import VectorFile
+
+FOOTPRINT_PROPERTY = 'system:footprint'
+
+
+def roi_union_geometry(roi: VectorFile):
+    """ROI 所有要素合并为一个 WGS84 几何"""
+    return roi.union_geometry()
+
+
+def build_roi_grid_points(roi: VectorFile, grid_size=64):
+    """
+    将 ROI 外接矩形划分为 grid_size 网格（按长边），保留落在 ROI 内的网格中心点。
+
+    :return: (xs, ys) 两个等长的 numpy 数组
+    """
+    roi_geom = roi_union_geometry(roi)
+    west, south, east, north = roi_geom.bounds
+    width, height = east - west, north - south
+    if width <= 0 or height <= 0:
+        point = roi_geom.representative_point()
+        return np.array([point.x]), np.array([point.y])
+
+    cell = max(width, height) / grid_size
+    nx = max(1, int(np.ceil(width / cell)))
+    ny = max(1, int(np.ceil(height / cell)))
+    xs = west + (np.arange(nx) + 0.5) * width / nx
+    ys = south + (np.arange(ny) + 0.5) * height / ny
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    grid_x, grid_y = grid_x.ravel(), grid_y.ravel()
+
+    inside = shapely.contains_xy(roi_geom, grid_x, grid_y)
+    if not inside.any():
+        # ROI 过小，没有网格中心落在内部时退化为一个代表点
+        point = roi_geom.representative_point()
+        return np.array([point.x]), np.array([point.y])
+    return grid_x[inside], grid_y[inside]
+
+
+def footprint_to_polygon(footprint):
+    """system:footprint（LinearRing / Polygon GeoJSON）转 shapely 面"""
+    if not footprint:
+        return None
+    if footprint.get('type') == 'LinearRing':
+        polygon = Polygon(footprint.get('coordinates', []))
+    else:
+        polygon = shape(footprint)
+    if not polygon.is_valid:
+        polygon = polygon.buffer(0)
+    return polygon
+
+
+def full_mask(point_count) -> int:
+    """全部网格点都被覆盖时的位掩码"""
+    return (1 << point_count) - 1
+
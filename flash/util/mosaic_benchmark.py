@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/24 10:20
+"""
+镶嵌引擎基准：python -m flash.util.mosaic_benchmark <GDAL bin 目录> [mosaic|quality]
+
+在同一批合成缩略图的全部组合上，对比原 gdalbuildvrt / gdal_translate 子进程实现（GdalMosaicCompositorImpl）
+与进程内镶嵌（InMemoryMosaicCompositorImpl），GDAL bin 目录需包含这两个命令行工具。
+"""
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Sequence
+
+import numpy as np
+
+from flash.model.Sentinel2TileItem import Sentinel2TileItem
+from flash.service.GdalMosaicCompositorImpl import GdalMosaicCompositorImpl
+from flash.service.InMemoryMosaicCompositorImpl import InMemoryMosaicCompositorImpl
+from flash.service.MosaicCompositor import COMPOSITE_MOSAIC
+from flash.util.S2_Util import array_to_geotiff, pixel_grid_for_bounds
+
+
+def benchmark_compositors(compositors: Dict[str, object], tile_dict, combinations: Sequence, repeat: int = 1) -> dict:
+    """
+    对比不同镶嵌合成器在同一批组合上的耗时（含 prepare），用于在 memory / gdal 引擎之间取舍。
+
+    :param compositors: {名称: MosaicCompositor}
+    :param tile_dict: 按 tile 分组的影像，缩略图 tif 需已就绪
+    :param combinations: 待合成的影像组合
+    :return: {名称: {'seconds', 'per_combination', 'outputs'}}
+    """
+    results = {}
+    for name, compositor in compositors.items():
+        outputs = []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            compositor.prepare(tile_dict)
+            for combination in combinations:
+                compositor.composite(combination, outputs.extend)
+        seconds = time.perf_counter() - started
+        count = max(1, len(combinations) * repeat)
+        results[name] = {'seconds': seconds, 'per_combination': seconds / count, 'outputs': len(outputs)}
+        print(f"{name}: {seconds:.3f}s，每个组合 {seconds / count * 1000:.1f}ms，输出 {len(outputs)} 个")
+    return results
+
+
+def synthetic_thumbnails(base_path: str, tile_count=3, scenes_per_tile=4, pixel_size=512) -> dict:
+    """在 base_path 下按 {tile}/{id}_{pixel_size}.tif 生成相互重叠的 RGBA 缩略图，返回按 tile 分组的影像"""
+    tile_dict = {}
+    for t in range(tile_count):
+        tile = f'T{t}'
+        west, south = 116.0 + 0.4 * t, 39.0 + 0.1 * (t % 2)
+        ring = [[west, south], [west + 0.5, south], [west + 0.5, south + 0.45], [west, south + 0.45]]
+        grid, transform = pixel_grid_for_bounds(ring, pixel_size)
+        rows, cols = np.mgrid[0:grid['dimensions']['height'], 0:grid['dimensions']['width']]
+        os.makedirs(os.path.join(base_path, tile), exist_ok=True)
+        tile_dict[tile] = []
+        for k in range(scenes_per_tile):
+            bands = [((np.sin(cols / (7 + b + k)) + np.cos(rows / (11 + b))) * 60 + 128).astype(np.uint8)
+                     for b in range(3)]
+            alpha = np.full(rows.shape, 255, dtype=np.uint8)
+            alpha[:, :20] = 0
+            image_id = f'{tile}_{k}'
+            array_to_geotiff(np.stack(bands + [alpha]), transform,
+                             os.path.join(base_path, tile, f'{image_id}_{pixel_size}.tif'))
+            tile_dict[tile].append(Sentinel2TileItem(tile, image_id, 0, 0))
+    return tile_dict
+
+
+def compare_with_gdal(gdal_bin_path: str, composite_mode=COMPOSITE_MOSAIC, pixel_size=512, **synthetic) -> dict:
+    """在同一批合成缩略图的全部组合上，对比进程内镶嵌与原 gdalbuildvrt / gdal_translate 子进程实现"""
+    base_path = tempfile.mkdtemp(prefix='mosaic_benchmark_')
+    try:
+        tile_dict = synthetic_thumbnails(base_path, pixel_size=pixel_size, **synthetic)
+        combinations = list(itertools.product(*tile_dict.values()))
+        print(f"{len(combinations)} 个组合，每景 {pixel_size} 像素，合成模式 {composite_mode}")
+        results = {}
+        for name, compositor in [
+            ('gdal', GdalMosaicCompositorImpl(base_path, pixel_size, gdal_bin_path, composite_mode)),
+            ('memory', InMemoryMosaicCompositorImpl(base_path, pixel_size, composite_mode)),
+            ('memory(png only)', InMemoryMosaicCompositorImpl(base_path, pixel_size, composite_mode,
+                                                              write_geotiff=False)),
+        ]:
+            shutil.rmtree(os.path.join(base_path, 'mosaic'), ignore_errors=True)
+            results.update(benchmark_compositors({name: compositor}, tile_dict, combinations))
+        return results
+    finally:
+        shutil.rmtree(base_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # python -m flash.util.mosaic_benchmark <GDAL bin 目录> [mosaic|quality]
+    compare_with_gdal(sys.argv[1], *sys.argv[2:3])
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/20 15:30
+"""
+时间窗口约束：按 system_time_start 排序的索引 + 滑动窗口，只生成时间跨度不超过上限的组合。
+
+每个组合以其中最早的元素为锚点，只在锚点所在窗口中生成一次，不重复也不遗漏。
+"""
+import itertools
+from bisect import bisect_right
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from flash.model.CombinationCost import DAY_MILLIS
+from flash.util.best_first_util import best_first_product, merge_by_cost
+
+
+class TemporalWindowIndex:
+    """多个候选列表上的时间排序索引"""
+
+    def __init__(self, lists: Sequence[Sequence], max_spread_days: float, time_of: Callable):
+        self.lists = lists
+        self.max_spread = max_spread_days * DAY_MILLIS
+        # (时间, 列表序号, 元素序号)，时间相同时按位置排序，保证锚点唯一
+        self.entries = sorted((time_of(element) or 0, k, i)
+                              for k, candidates in enumerate(lists)
+                              for i, element in enumerate(candidates))
+        self.times = [t for t, _, _ in self.entries]
+
+    def windows(self) -> Iterator[List[list]]:
+        """
+        依次以每个元素为锚点，给出受限后的候选列表：
+        锚点所在列表只保留锚点，其他列表只保留排在锚点之后且在窗口内的元素。
+        """
+        for p, (t, k, i) in enumerate(self.entries):
+            end = bisect_right(self.times, t + self.max_spread)
+            restricted = [[] for _ in self.lists]
+            restricted[k].append(self.lists[k][i])
+            for _, k2, i2 in self.entries[p + 1:end]:
+                if k2 != k:
+                    restricted[k2].append(self.lists[k2][i2])
+            if all(restricted):
+                yield restricted
+
+    def count_optional(self) -> int:
+        """锚点列表必选、其他列表可选一个或不选时的组合数，不枚举组合"""
+        total = 0
+        for p, (t, k, _) in enumerate(self.entries):
+            end = bisect_right(self.times, t + self.max_spread)
+            counts = {}
+            for _, k2, _ in self.entries[p + 1:end]:
+                if k2 != k:
+                    counts[k2] = counts.get(k2, 0) + 1
+            product = 1
+            for count in counts.values():
+                product *= 1 + count
+            total += product
+        return total
+
+
+def windowed_product(lists: Sequence[Sequence], max_spread_days: Optional[float],
+                     time_of: Callable) -> Iterator[tuple]:
+    """字典序笛卡尔积，只生成时间跨度不超过 max_spread_days 的组合"""
+    if max_spread_days is None:
+        yield from itertools.product(*lists)
+        return
+    for restricted in TemporalWindowIndex(lists, max_spread_days, time_of).windows():
+        yield from itertools.product(*restricted)
+
+
+def windowed_best_first_product(lists: Sequence[Sequence], element_cost: Callable, penalty: Optional[Callable],
+                                max_spread_days: Optional[float], time_of: Callable):
+    """按代价升序的笛卡尔积，只生成时间跨度不超过 max_spread_days 的组合"""
+    if max_spread_days is None:
+        return best_first_product(lists, element_cost, penalty)
+    streams = []
+    for restricted in TemporalWindowIndex(lists, max_spread_days, time_of).windows():
+        bound = sum(min(element_cost(element) for element in candidates) for candidates in restricted)
+        streams.append((bound, best_first_product(restricted, element_cost, penalty)))
+    streams.sort(key=lambda stream: stream[0])
+    return merge_by_cost(streams)
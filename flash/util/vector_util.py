@@ -1,7 +1,50 @@
 # -*- coding: utf-8 -*-            
 # @Author : ZXQ
 # @Time : 2025/9/11 7:55
+"""ROI 预处理：矢量只读取一次，简化、计算内容哈希，缓存 ee.Geometry 和紧凑 GeoJSON"""
+from typing import Dict, Tuple
 
+from shapely.geometry import mapping
 
+from flash.model.PreparedRoi import PreparedRoi
+from flash.model.VectorFile import VectorFile
 
+# GeoJSON 坐标保留的小数位数，约 0.1 m
+COORDINATE_DECIMALS = 6
 
+_prepared_cache: Dict[Tuple[str, float], PreparedRoi] = {}
+
+
+def _round_coordinates(coordinates, decimals=COORDINATE_DECIMALS):
+    if isinstance(coordinates, (int, float)):
+        return round(coordinates, decimals)
+    return [_round_coordinates(c, decimals) for c in coordinates]
+
+
+def _compact_geojson(geometry) -> dict:
+    geojson = mapping(geometry)
+    if 'coordinates' in geojson:
+        geojson = {'type': geojson['type'], 'coordinates': _round_coordinates(geojson['coordinates'])}
+    return geojson
+
+
+def prepare_roi(roi: VectorFile, tolerance: float = None) -> PreparedRoi:
+    """
+    返回 ROI 的预处理结果，按 (内容哈希, 容差) 缓存，同一 ROI 多次调用不会重复序列化。
+
+    :param tolerance: 简化容差（度），None 时使用 roi.simplify_tolerance，0 表示不简化
+    """
+    tolerance = roi.simplify_tolerance if tolerance is None else tolerance
+    key = (roi.content_hash(), tolerance)
+    prepared = _prepared_cache.get(key)
+    if prepared is None:
+        geometry = roi.union_geometry()
+        if tolerance:
+            simplified = geometry.simplify(tolerance, preserve_topology=True)
+            # 过小的 ROI 简化后可能退化为空，保留原几何
+            geometry = geometry if simplified.is_empty else simplified
+        feature_geojsons = [_compact_geojson(g) for g in roi.wgs84_gdf().geometry.values
+                            if g is not None and not g.is_empty]
+        prepared = PreparedRoi(key[0], tolerance, geometry, _compact_geojson(geometry), feature_geojsons)
+        _prepared_cache[key] = prepared
+    return prepared
@@ -169,6 +169,21 @@ class AutoFindLowCloudView(Widget):
         max = result['max_tile_num']
         self.progress_value_badge.setText(str(f'current_mosaic_num:{current}:max_tile_num:{max}'))
 
+    @Slot(dict)
+    def stage_callback(self, result):
+        """查询 / 解析 / 搜索阶段切换时更新提示，搜索阶段的数量进度由 progress_max_value_callback 更新"""
+        self.progress_value_badge.setText(f"{result['index']}/{result['total']} {result['text']}:{result['status']}")
+        if result['status'] == 'failed':
+            InfoBar.error(
+                title='错误',
+                content=f"{result['text']}失败，请查看日志",
+                orient=Qt.Orientation.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.BOTTOM_RIGHT,
+                duration=3000,
+                parent=self
+            )
+
     @Slot()
     def find(self):
         InfoBar.info(
@@ -185,6 +200,7 @@ class AutoFindLowCloudView(Widget):
         self.worker = AutoFindSentinel2LowCloudImplThread(self.data_source_configure,self.thread_operate_status)
         self.worker.emit_thumbnail_url.connect(self.thumbnail_url_callback)
         self.worker.emit_progress.connect(self.progress_max_value_callback)
+        self.worker.emit_stage.connect(self.stage_callback)
 
         self.worker.start()
 
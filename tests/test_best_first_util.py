@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/22 11:05
+from flash.util.best_first_util import merge_sources
+
+
+def test_merge_sources_is_ordered_and_lazy():
+    started = []
+
+    def source(name, bounds):
+        started.append(name)
+        for bound in bounds:
+            yield bound, f'{name}{bound}'
+
+    merged = merge_sources([(1, source('a', [1, 4, 6])), (2, source('b', [3, 5])), (10, source('c', [10]))])
+    assert [next(merged) for _ in range(4)] == [(1, 'a1'), (3, 'b3'), (4, 'a4'), (5, 'b5')]
+    # 下界为 10 的来源还没轮到，不应开始计算
+    assert started == ['a', 'b']
+    assert list(merged) == [(6, 'a6'), (10, 'c10')]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/24 10:30
+from flash.service.SqliteSceneCatalogServiceImpl import merge_ranges, missing_ranges
+
+
+def test_disjoint_query_fetches_only_its_own_range():
+    synced = [(100, 200)]
+    assert missing_ranges(synced, 500, 600) == [(500, 600)]
+    assert missing_ranges(synced, 50, 250) == [(50, 100), (200, 250)]
+    assert missing_ranges(synced, 120, 180) == []
+
+
+def test_gap_between_synced_ranges_is_filled_once():
+    synced = merge_ranges([(100, 200), (500, 600), (150, 180), (600, 650), (700, 700)])
+    assert synced == [(100, 200), (500, 650)]
+    assert missing_ranges(synced, 0, 1000) == [(0, 100), (200, 500), (650, 1000)]
+    assert merge_ranges(synced + missing_ranges(synced, 0, 1000)) == [(0, 1000)]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/22 10:20
+import json
+import random
+import time
+
+import pytest
+from shapely.geometry import box, mapping
+
+from flash.model.SceneTable import group_tile_items
+from flash.model.SearchBudget import SearchBudget
+from flash.model.Sentinel2Image import OrbitDirection, Sentinel2Image
+from flash.model.VectorFile import VectorFile
+from flash.service.SetCoverMosaicSearchEngineImpl import (BRANCH_AND_BOUND, GREEDY, UNIT_DATATAKE, UNIT_TILE,
+                                                          SetCoverMosaicSearchEngineImpl)
+
+DAY_MILLIS = 86400000
+
+
+@pytest.fixture
+def roi(tmp_path):
+    return write_roi(tmp_path, box(0, 0, 1, 1))
+
+
+@pytest.fixture
+def wide_roi(tmp_path):
+    return write_roi(tmp_path, box(0, 0, 3, 1))
+
+
+def write_roi(tmp_path, geometry):
+    path = tmp_path / 'roi.geojson'
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {}, 'geometry': mapping(geometry)}]}))
+    return VectorFile(str(path))
+
+
+def make_image(roi, image_id, tile, footprint, orbit, day, cloud):
+    return Sentinel2Image(type='Image', id=image_id, version=1, bands=[],
+                          properties={'system:footprint': mapping(footprint)},
+                          CLOUDY_PIXEL_PERCENTAGE=cloud, SPACECRAFT_NAME='Sentinel-2A',
+                          SENSING_ORBIT_DIRECTION=OrbitDirection.DESCENDING, SENSING_ORBIT_NUMBER=orbit,
+                          MGRS_TILE=tile, PROCESSING_BASELINE='05.09', GENERATION_TIME=0, system_asset_size=0,
+                          system_time_start=day * DAY_MILLIS, system_time_end=day * DAY_MILLIS, roi=roi)
+
+
+def swath_edge_tiles(roi):
+    """tile X 的两景各只覆盖 ROI 的一部分（并集看起来能单独覆盖），只有 X_left + Y_full 真正覆盖"""
+    return group_tile_items([
+        make_image(roi, 'X_left', 'X', box(-1, -1, 0.6, 2), 1, 1, 5),
+        make_image(roi, 'X_right', 'X', box(0.4, -1, 2, 2), 2, 3, 5),
+        make_image(roi, 'Y_full', 'Y', box(0.5, -1, 3, 2), 2, 8, 5),
+    ])
+
+
+def search_ids(engine, tile_dict):
+    return [sorted(item.id for item in combination) for _, combination in engine.search_with_cost(tile_dict)]
+
+
+@pytest.mark.parametrize('mode', [GREEDY, BRANCH_AND_BOUND])
+def test_swath_edge_tile_is_not_treated_as_covering(roi, mode):
+    engine = SetCoverMosaicSearchEngineImpl(roi, mode=mode, grid_size=32, unit=UNIT_TILE)
+    assert search_ids(engine, swath_edge_tiles(roi)) == [['X_left', 'Y_full']]
+
+
+def test_full_tile_still_prunes_supersets(roi):
+    tile_dict = group_tile_items([
+        make_image(roi, 'X_full', 'X', box(-1, -1, 2, 2), 1, 1, 5),
+        make_image(roi, 'Y_full', 'Y', box(0.5, -1, 3, 2), 2, 8, 1),
+    ])
+    engine = SetCoverMosaicSearchEngineImpl(roi, mode=BRANCH_AND_BOUND, grid_size=32, unit=UNIT_TILE)
+    assert search_ids(engine, tile_dict) == [['X_full']]
+
+
+@pytest.mark.parametrize('mode', [GREEDY, BRANCH_AND_BOUND])
+def test_swath_edge_datatake_fill_in(roi, mode):
+    engine = SetCoverMosaicSearchEngineImpl(roi, mode=mode, grid_size=32, unit=UNIT_DATATAKE)
+    assert ['X_left', 'Y_full'] in search_ids(engine, swath_edge_tiles(roi))
+
+
+def two_orbit_scenes(roi, scene_count):
+    """两条轨道交替过境 3 个 tile，每条轨道都只覆盖 ROI 的一部分，必须跨 datatake 组合"""
+    rng = random.Random(0)
+    images = []
+    for day in range(scene_count // 3):
+        orbit = 1 + day % 2
+        swath = box(-5, -5, 2.3, 5) if orbit == 1 else box(0.7, -5, 5, 5)
+        for t in range(3):
+            footprint = box(t - 0.1, -1, t + 1.1, 2).intersection(swath)
+            if not footprint.is_empty:
+                images.append(make_image(roi, f'S{day}_{t}', f'T{t}', footprint, orbit, day, rng.uniform(0, 100)))
+    return group_tile_items(images)
+
+
+@pytest.mark.parametrize('mode', [GREEDY, BRANCH_AND_BOUND])
+def test_datatake_time_to_first_result(wide_roi, mode):
+    tile_dict = two_orbit_scenes(wide_roi, 320)
+    engine = SetCoverMosaicSearchEngineImpl(wide_roi, mode=mode, grid_size=32, unit=UNIT_DATATAKE)
+
+    started = time.perf_counter()
+    ranked = engine.search_with_cost(tile_dict)
+    first_cost, _ = next(ranked)
+    assert time.perf_counter() - started < 2.0
+    assert all(cost >= first_cost for cost, _ in [next(ranked) for _ in range(20)])
+
+
+@pytest.mark.parametrize('unit', [UNIT_TILE, UNIT_DATATAKE])
+def test_expired_budget_stops_enumeration(wide_roi, unit):
+    tile_dict = two_orbit_scenes(wide_roi, 320)
+    engine = SetCoverMosaicSearchEngineImpl(wide_roi, mode=BRANCH_AND_BOUND, grid_size=32, unit=unit)
+    assert next(engine.search_with_cost(tile_dict, SearchBudget()), None) is not None
+
+    budget = SearchBudget(deadline_seconds=0)
+    budget.start()
+    assert list(engine.search_with_cost(tile_dict, budget)) == []
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# @Author : ZXQ
+# @Time : 2025/9/23 15:40
+import os
+
+from flash.model.ThumbnailCache import ThumbnailCache
+
+
+def write_file(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    return str(path)
+
+
+def test_files_written_before_a_crash_are_counted_and_evicted(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache = ThumbnailCache(str(cache_dir), max_bytes=250)
+    cache.put('a', write_file(tmp_path / 'a.tif', 100))
+    cache.save()
+    cache.put('b', write_file(tmp_path / 'b.tif', 100))
+    # 异常退出：b 已写入缓存目录但索引没有保存，还留下了写到一半的临时文件
+    write_file(cache_dir / 'c.tif.123.tmp', 10)
+
+    reloaded = ThumbnailCache(str(cache_dir), max_bytes=250)
+    assert list(reloaded.entries) == ['a', 'b']
+    assert reloaded.total_bytes == 200
+    assert not os.path.exists(cache_dir / 'c.tif.123.tmp')
+
+    reloaded.put('c', write_file(tmp_path / 'c.tif', 100))
+    assert list(reloaded.entries) == ['b', 'c']
+    assert not os.path.exists(reloaded.path_for('a'))
+
+
+def test_checked_out_entry_is_not_evicted(tmp_path):
+    cache = ThumbnailCache(str(tmp_path / 'cache'), max_bytes=150)
+    cache.put('a', write_file(tmp_path / 'a.tif', 100))
+    with cache.checkout('a') as path:
+        cache.put('b', write_file(tmp_path / 'b.tif', 100))
+        assert os.path.exists(path)
+        assert list(cache.entries) == ['a', 'b']
+    assert cache.get('a', str(tmp_path / 'copy.tif'))
+
+    cache.put('c', write_file(tmp_path / 'c.tif', 100))
+    assert 'a' not in cache.entries
+    with cache.checkout('a') as path:
+        assert path is None
+
+
+def test_work_file_shares_data_with_cache_entry(tmp_path):
+    cache = ThumbnailCache(str(tmp_path / 'cache'), max_bytes=1000)
+    work_path = write_file(tmp_path / 'a.tif', 100)
+    cache.put('a', work_path)
+    assert os.path.samefile(work_path, cache.path_for('a'))
+
+    # 工作目录已有的旧文件先删除再链接，不会改写其他缓存条目的内容
+    cache.put('b', write_file(tmp_path / 'b.tif', 50))
+    assert cache.get('b', work_path)
+    assert os.path.samefile(work_path, cache.path_for('b'))
+    assert os.path.getsize(cache.path_for('a')) == 100